@@ -3,29 +3,42 @@ from datetime import datetime
 import re
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from urllib3 import request
-from fake_useragent import UserAgent
+
+from utils import useragent
+from utils.html import has_class, parse_html
 
 class GenieCrawler(object):
 
-    
-    def __init__(self, base_url='https://www.genie.co.kr/chart/top200?'):
+    provider = 'genie'
 
+    # only the page body is built
+    parse_only = SoupStrainer(id='body-content')
+    
+    def __init__(self, base_url='https://www.genie.co.kr/chart/top200?', session=None, timeout=10):
+        """
+        Args:
+            base_url(str): chart url
+            session(requests.Session): shared keep-alive session, a new one when None
+            timeout(int): seconds per request
+        """
         self.base_url = base_url
         self.params = [request.urlencode({'pg' : i}) for i in range (1, 5)]
+        self.session = session or requests.Session()
+        self.timeout = timeout
         
 
     def get_response(self, URL, params, headers):
     
-        response = requests.get(URL, params, headers=headers)
+        response = self.session.get(URL, params=params, headers=headers, timeout=self.timeout)
 
         if response.status_code in [200, 201]:
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse_html(response.text, self.parse_only)
             return soup
 
         else:
-            logging.error('get(%s) failed' % (URL, response.status_code))
+            logging.error('get(%s) failed: %s' % (URL, response.status_code))
             
             
     def _math_mark(self, dif):
@@ -49,26 +62,60 @@ class GenieCrawler(object):
                 return -int(found[0])
             
                         
-    def run(self):
-        
+    def fetch(self, param):
+        """
+        Args:
+            param(str): one element of self.params
+        Returns:
+            BeautifulSoup: chart page, None if the request failed
+        """
+        headers = useragent.headers()
+
+        return self.get_response(self.base_url, param, headers=headers)
+
+    def parse(self, soups):
+        """
+        Args:
+            soups(BeautifulSoup): chart page
+        Returns:
+            list: (rank, diff, song, artist) tuples
+        """
         base_tag = '#body-content div div table tbody tr'
+
+        rows = []
+
+        if soups is None:
+            return rows
+
+        soups_base = soups.select(base_tag)
+
+        for soup in soups_base:
+
+            # one pass over the row for the number cell, title and artist links
+            number = song = artist = None
+
+            for tag in soup.find_all(['td', 'a']):
+                if tag.name == 'td':
+                    if number is None and has_class(tag, 'number'):
+                        number = tag
+                elif song is None and has_class(tag, 'title', 'ellipsis'):
+                    song = tag
+                elif artist is None and has_class(tag, 'artist', 'ellipsis'):
+                    artist = tag
+
+            rank_now, dif = re.sub(r'\s', ' ', number.text).split()
+            dif_pre = self._math_mark(dif)
+            rows.append((rank_now, dif_pre, song.text.strip(), artist.text.strip()))
+
+        return rows
+
+    def run(self):
         
         for param in self.params:
             
-            ua = UserAgent()
-            
-            headers = {'User-Agent': ua.ie}
-            
-            soups = self.get_response(self.base_url, param, headers=headers)
-            
-            soups_base = soups.select(base_tag)
+            rows = self.parse(self.fetch(param))
+            created_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            for soup in soups_base:
-                
-                rank_and_dif = soup.select('td.number')
-                rank_now, dif = re.sub(r'\s', ' ', rank_and_dif[0].text).split()
-                dif_pre = self._math_mark(dif)
-                song = soup.select('td a.title.ellipsis')[0].text.strip()
-                artist = soup.select('td a.artist.ellipsis')[0].text.strip()
-                created_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                print (rank_now, dif_pre, song, artist, created_time)     
+            for rank_now, dif_pre, song, artist in rows:
+                print (rank_now, dif_pre, song, artist, created_time)
+     
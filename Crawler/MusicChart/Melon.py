@@ -3,28 +3,42 @@ from datetime import datetime
 import re
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from urllib3 import request
-from fake_useragent import UserAgent
+
+from utils import useragent
+from utils.html import parse_html
 
 class MelonCrawler(object):
+
+    provider = 'melon'
+
+    # only the chart form is built
+    parse_only = SoupStrainer(id='frm')
     
-    def __init__(self, base_url = 'https://www.melon.com/chart/index.htm#params%5Bidx%'):
-        
+    def __init__(self, base_url = 'https://www.melon.com/chart/index.htm#params%5Bidx%', session=None, timeout=10):
+        """
+        Args:
+            base_url(str): chart url
+            session(requests.Session): shared keep-alive session, a new one when None
+            timeout(int): seconds per request
+        """
         self.base_url = base_url
-        self.params = request.urlencode({'5D':1})
+        self.params = [request.urlencode({'5D':1})]
+        self.session = session or requests.Session()
+        self.timeout = timeout
         
         
     def get_response(self, URL, params, headers):
     
-        response = requests.get(URL, params, headers=headers)
+        response = self.session.get(URL, params=params, headers=headers, timeout=self.timeout)
 
         if response.status_code in [200, 201]:
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse_html(response.text, self.parse_only)
             return soup
 
         else:
-            logging.error('get(%s) failed' % (URL, response.status_code))
+            logging.error('get(%s) failed: %s' % (URL, response.status_code))
             
             
     def _math_mark(self, dif):
@@ -44,29 +58,57 @@ class MelonCrawler(object):
         elif mark == '상승':
             return number_pre
         
-    def run(self):
-        
+    def fetch(self, param):
+        """
+        Args:
+            param(str): one element of self.params
+        Returns:
+            BeautifulSoup: chart page, None if the request failed
+        """
+        headers = useragent.headers()
+
+        return self.get_response(self.base_url, param, headers=headers)
+
+    def parse(self, soups):
+        """
+        Args:
+            soups(BeautifulSoup): chart page
+        Returns:
+            list: (rank, diff, song, artists) tuples
+        """
         base_tag = '#frm div table tbody tr'
+
+        rows = []
+
+        if soups is None:
+            return rows
+
+        soups_base = soups.select(base_tag)
+
+        for soup in soups_base:
+
+            # one selector pass over the row: every span, and every link inside a span, in document order
+            tags = soup.select('span, span a')
+            spans = [tag for tag in tags if tag.name == 'span']
+            links = [tag for tag in tags if tag.name == 'a']
+
+            rank = spans[0].text
+            dif = spans[2].get('title')
+            dif_pre = self._math_mark(dif)
+            song = links[0].text
+            artists = ', '.join([artist.text for artist in links[1:]])
+            rows.append((rank, dif_pre, song, artists))
+
+        return rows
+
+    def run(self):
         
         for param in self.params:
             
-            ua = UserAgent()
-            
-            headers = {'User-Agent' : ua.ie}
-            
-            soups = self.get_response(self.base_url, param, headers=headers)
-            
-            soups_base = soups.select(base_tag)
+            rows = self.parse(self.fetch(param))
+            created_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            for soup in soups_base:
-                
-                rank = soup.select('span')[0].text
-                dif = soup.select('span')[2].get('title')
-                dif_pre = self._math_mark(dif)
-                song = soup.select('span a')[0].text
-                artists = soup.select('span a')[1:]
-                artists = ', '.join([artist.text for artist in artists])
-                created_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for rank, dif_pre, song, artists in rows:
                 print (rank, dif_pre, song, artists, created_time)
 
 
@@ -2,28 +2,43 @@ import logging
 from datetime import datetime
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from urllib3 import request
-from fake_useragent import UserAgent
+
+from utils import useragent
+from utils.html import has_class, parse_html
 
 class NaverMusicCrawler(object):
 
+    provider = 'naver'
+
+    # only the content area is built
+    parse_only = SoupStrainer('div', id='content')
     
-    def __init__(self, base_url='https://music.naver.com/listen/top100.nhn?domain=TOTAL&duration=1h'):
+    def __init__(self, base_url='https://music.naver.com/listen/top100.nhn?domain=TOTAL&duration=1h',
+                 session=None, timeout=10):
+        """
+        Args:
+            base_url(str): chart url
+            session(requests.Session): shared keep-alive session, a new one when None
+            timeout(int): seconds per request
+        """
         self.base_url = base_url
         self.params = [request.urlencode({'page' : i}) for i in range (1, 3)]
+        self.session = session or requests.Session()
+        self.timeout = timeout
         
 
     def get_response(self, URL, params, headers):
     
-        response = requests.get(URL, params, headers=headers)
+        response = self.session.get(URL, params=params, headers=headers, timeout=self.timeout)
 
         if response.status_code in [200, 201]:
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse_html(response.text, self.parse_only)
             return soup
 
         else:
-            logging.error('get(%s) failed' % (URL, response.status_code))
+            logging.error('get(%s) failed: %s' % (URL, response.status_code))
             
             
     def _math_mark(self, diff):
@@ -42,25 +57,62 @@ class NaverMusicCrawler(object):
         elif standard == '신규':
             return 'NEW'
             
-    def run(self):
-        
+    def fetch(self, param):
+        """
+        Args:
+            param(str): one element of self.params
+        Returns:
+            BeautifulSoup: chart page, None if the request failed
+        """
+        headers = useragent.headers()
+
+        return self.get_response(self.base_url, param, headers=headers)
+
+    def parse(self, soup):
+        """
+        Args:
+            soup(BeautifulSoup): chart page
+        Returns:
+            list: (rank, diff, song, artist) tuples
+        """
         base_tag = 'div#content div div table tbody tr'
+
+        rows = []
+
+        if soup is None:
+            return rows
+
+        soup_select = soup.select(base_tag)[1:]
+
+        for soup in soup_select:
+
+            # one pass over the row for the ranking, change and artist cells and the title span
+            ranking = change = song = artist = None
+
+            for tag in soup.find_all(['td', 'span']):
+                if tag.name == 'span':
+                    if song is None and has_class(tag, 'ellipsis') and tag.find_parent('a') is not None:
+                        song = tag
+                elif ranking is None and has_class(tag, 'ranking'):
+                    ranking = tag
+                elif change is None and has_class(tag, 'change'):
+                    change = tag
+                elif artist is None and has_class(tag, '_artist', 'artist'):
+                    artist = tag
+
+            rank_dif = change.text.strip().split('\n')
+            rank_dif_pre = self._math_mark(rank_dif)
+            rows.append((ranking.text, rank_dif_pre, song.text.strip(), artist.text.strip()))
+
+        return rows
+
+    def run(self):
         
         for param in self.params:
             
-            ua = UserAgent()
-            
-            headers = {'User-Agent' : ua.ie}
+            rows = self.parse(self.fetch(param))
+            created_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
-            soup = self.get_response(self.base_url, param, headers=headers)
-            soup_select = soup.select(base_tag)[1:]
-            
-            for soup in soup_select:
-                
-                rank_now = soup.select('td.ranking')[0].text
-                rank_dif = soup.select('td.change')[0].text.strip().split('\n')
-                rank_dif_pre = self._math_mark(rank_dif)
-                song = soup.select('td a span.ellipsis')[0].text.strip()
-                artist = soup.select('td._artist.artist')[0].text.strip()
-                created_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for rank_now, rank_dif_pre, song, artist in rows:
                 print (rank_now, rank_dif_pre, song, artist, created_time)
+
@@ -0,0 +1,97 @@
+"""
+Chart snapshot of every music provider, fetched concurrently over one keep-alive session
+"""
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from MusicChart.Genie import GenieCrawler
+from MusicChart.Melon import MelonCrawler
+from MusicChart.Navermusic import NaverMusicCrawler
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = (MelonCrawler, GenieCrawler, NaverMusicCrawler)
+
+
+ChartRow = namedtuple('ChartRow', ['provider', 'rank', 'song', 'artist', 'collected_at'])
+
+
+class ChartCollector(object):
+    """
+    Every page of every provider is a task on one thread pool, all sharing a keep-alive session,
+    so a snapshot takes about one page's latency
+
+    Examples:
+        >>> with ChartCollector() as collector:
+        ...     rows = collector.collect()
+    """
+
+    def __init__(self, providers=PROVIDERS, max_workers=8, timeout=10):
+        """
+        Args:
+            providers(tuple): chart crawler classes taking session and timeout
+            max_workers(int): concurrent page requests, also the session's connection pool size
+            timeout(int): seconds per request
+        """
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(providers), pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.crawlers = [provider(session=self.session, timeout=timeout) for provider in providers]
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _page(self, crawler, param, collected_at):
+        try:
+            soup = crawler.fetch(param)
+        except requests.RequestException as e:
+            logger.error('%s page %s failed: %r' % (crawler.provider, param, e))
+            return None
+
+        if soup is None:
+            return None
+
+        # a changed page layout breaks the parser, the other charts are still collected
+        try:
+            return [ChartRow(crawler.provider, int(rank), song, artist, collected_at)
+                    for rank, _, song, artist in crawler.parse(soup)]
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+            logger.error('%s page %s parse failed: %r' % (crawler.provider, param, e))
+            return None
+
+    def collect(self, collected_at=None):
+        """
+        Args:
+            collected_at(datetime): timestamp of the snapshot, default now
+        Returns:
+            list: ChartRow records of every provider, in provider and page order.
+                a provider with a failed page is left out, half a chart would read as songs leaving it
+        """
+        collected_at = collected_at or datetime.now().replace(microsecond=0)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pages = [(crawler, executor.submit(self._page, crawler, param, collected_at))
+                     for crawler in self.crawlers for param in crawler.params]
+
+            results = [(crawler, page.result()) for crawler, page in pages]
+
+        failed = {crawler.provider for crawler, page in results if page is None}
+
+        for provider in failed:
+            logger.error('%s left out of the snapshot' % provider)
+
+        return [row for crawler, page in results if crawler.provider not in failed for row in page]
+
+    def close(self):
+        self.session.close()
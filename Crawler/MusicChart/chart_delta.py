@@ -0,0 +1,42 @@
+from collections import defaultdict, namedtuple
+
+from utils.record import Record
+from utils.snapshot import SnapshotStore
+
+
+class ChartRank(Record, namedtuple('ChartRank', ['provider', 'song', 'artist', 'chart_rank', 'prev_rank',
+                                                 'collected_at'])):
+    """t_music_chart_rank row, chart_rank is None for a song leaving the chart, prev_rank None for one entering it"""
+    __slots__ = ()
+    COLUMNS = ('provider', 'song', 'artist', 'chart_rank', 'prev_rank', 'collected_at')
+
+
+class ChartSnapshotStore(SnapshotStore):
+    """
+    Previous chart per provider, {(song, artist): rank}, kept in memory and in a json file.
+    Rank changes are computed from the two charts, the providers' own diff marks are not used.
+    diff() compares a new snapshot with it, save() advances the charts once the diff is written
+    """
+
+    def __init__(self, path='.chart_snapshots.json'):
+        """
+        Args:
+            path(str): json file path
+        """
+        super(ChartSnapshotStore, self).__init__(path)
+
+    def diff(self, rows, collected_at):
+        """compare every provider's chart in rows with its snapshot, see SnapshotStore.compare
+        Args:
+            rows(list): ChartRow records of one snapshot
+            collected_at(datetime): timestamp of the snapshot
+        Returns:
+            list: ChartRank records of entries, exits and rank changes
+        """
+        charts = defaultdict(dict)
+
+        for row in rows:
+            charts[row.provider].setdefault((row.song, row.artist), row.rank)
+
+        return [ChartRank(provider, song, artist, rank, prev_rank, collected_at)
+                for provider, (song, artist), rank, prev_rank in self.compare(charts)]
@@ -3,42 +3,80 @@ from datetime import datetime
 import re
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from urllib3 import request
-from fake_useragent import UserAgent
+
+from utils import useragent
+from utils.html import parse_html
 
 class DaumKeywordCrawler(object):
     
-    def __init__(self, base_url='https://www.daum.net/', params=None):
-        
+    source = 'daum'
+    
+    # only the realtime issue box is built
+    parse_only = SoupStrainer('div', class_='hotissue_builtin')
+    
+    def __init__(self, base_url='https://www.daum.net/', params=None, session=None, timeout=10):
+        """
+        Args:
+            base_url(str): page with the realtime issue ranking
+            params(dict): query parameters
+            session(requests.Session): shared keep-alive session, a new one when None
+            timeout(int): seconds per request
+        """
         self.base_url = base_url
         self.params = params
+        self.session = session or requests.Session()
+        self.timeout = timeout
         
     def get_response(self, URL, params, headers):
 
-        response = requests.get(URL, params, headers=headers)
+        response = self.session.get(URL, params=params, headers=headers, timeout=self.timeout)
 
         if response.status_code in [200, 201]:
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse_html(response.text, self.parse_only)
             return soup
 
         else:
-            logging.error('get(%s) failed' % (URL, response.status_code))
+            logging.error('get(%s) failed: %s' % (URL, response.status_code))
             
-    def run(self):
+    def fetch(self):
+        """
+        Returns:
+            BeautifulSoup: ranking page, None if the request failed
+        """
+        headers = useragent.headers()
         
-        ua = UserAgent()
+        return self.get_response(self.base_url, self.params, headers)
         
-        headers = {'User-Agent': ua.ie}
+    def parse(self, soup_org):
+        """
+        Args:
+            soup_org(BeautifulSoup): page returned by fetch()
+        Returns:
+            list: (category, rank, keyword) of the realtime issue ranking, empty if soup_org is None
+        """
+        if soup_org is None:
+            return []
         
-        soup_org = self.get_response(self.base_url, self.params, headers)
         base_tag = 'div.hotissue_builtin'
         soup_base = soup_org.select(base_tag)
+        
+        if not soup_base:
+            return []
+        
+        # the ranking is rendered twice, for the rolling and the expanded box
         ranks = soup_base[0].select('span.ir_wa')[::2]
         keywords = soup_base[0].select('a.link_issue')[::2]
+        
+        return [('realtime', int(re.sub(r'\D', '', rank.text)), keyword.text.strip())
+                for (rank, keyword) in zip(ranks, keywords)]
+        
+    def run(self):
+        
         created_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        rank_keyword_time = [(rank.text, keyword.text, created_time) for (rank, keyword) in zip(ranks, keywords)]
+        rank_keyword_time = [(rank, keyword, created_time) for (_, rank, keyword) in self.parse(self.fetch())]
         
         print (rank_keyword_time)
         
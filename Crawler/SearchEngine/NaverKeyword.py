@@ -3,50 +3,87 @@ from datetime import datetime
 import re
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 from urllib3 import request
-from fake_useragent import UserAgent
+
+from utils import useragent
+from utils.html import parse_html
 
 class NaverKeywordCraler(object):
     
-    def __init__(self, base_url='https://datalab.naver.com/keyword/realtimeList.naver', params=None):
-        
+    source = 'naver'
+    
+    # only the content area is built
+    parse_only = SoupStrainer('div', id='content')
+    
+    def __init__(self, base_url='https://datalab.naver.com/keyword/realtimeList.naver', params=None,
+                 session=None, timeout=10):
+        """
+        Args:
+            base_url(str): realtime keyword ranking url
+            params(dict): query parameters
+            session(requests.Session): shared keep-alive session, a new one when None
+            timeout(int): seconds per request
+        """
         self.base_url = base_url
         self.params = params
+        self.session = session or requests.Session()
+        self.timeout = timeout
         
         
     def get_response(self, URL, params, headers):
     
-        response = requests.get(URL, params, headers=headers)
+        response = self.session.get(URL, params=params, headers=headers, timeout=self.timeout)
 
         if response.status_code in [200, 201]:
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse_html(response.text, self.parse_only)
             return soup
 
         else:
-            logging.error('get(%s) failed' % (URL, response.status_code))
+            logging.error('get(%s) failed: %s' % (URL, response.status_code))
             
-    def run(self):
-        
-        base_tag = '#content div div div div div div.rank_inner'
+    def fetch(self):
+        """
+        Returns:
+            BeautifulSoup: ranking page, None if the request failed
+        """
+        headers = useragent.headers()
         
-        ua = UserAgent()
+        return self.get_response(self.base_url, self.params, headers)
         
-        headers = {'User-Agent': ua.ie}
+    def parse(self, soups_org):
+        """
+        Args:
+            soups_org(BeautifulSoup): page returned by fetch()
+        Returns:
+            list: (category, rank, keyword) of every age group's ranking, empty if soups_org is None
+        """
+        if soups_org is None:
+            return []
         
-        soups_org = self.get_response(self.base_url, self.params, headers)
+        base_tag = '#content div div div div div div.rank_inner'
         
         soups_base = soups_org.select(base_tag)
         
+        rows = []
+        
         for soups in soups_base:
 
-            category = soups.select('strong')[0].text
+            category = soups.find('strong').text.strip()
             soups_tag = soups.select('div ul a')
             for soup in soups_tag:
-                rank = int(soup.select('em')[0].text)
-                keyword = soup.select('span')[0].text
-                created_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                print (category, rank, keyword, created_time)
+                rank = int(soup.find('em').text)
+                keyword = soup.find('span').text.strip()
+                rows.append((category, rank, keyword))
+                
+        return rows
+            
+    def run(self):
+        
+        created_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        for category, rank, keyword in self.parse(self.fetch()):
+            print (category, rank, keyword, created_time)
 
 
 if __name__ == '__main__':
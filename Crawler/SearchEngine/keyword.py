@@ -0,0 +1,137 @@
+"""
+Realtime keyword rankings of Naver and Daum polled on a fixed interval, keeping rank changes only
+"""
+import logging
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from SearchEngine.DaumKeyword import DaumKeywordCrawler
+from SearchEngine.NaverKeyword import NaverKeywordCraler
+from utils.record import Record
+from utils.snapshot import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+SOURCES = (NaverKeywordCraler, DaumKeywordCrawler)
+
+
+class KeywordRank(Record, namedtuple('KeywordRank', ['source', 'category', 'keyword', 'kw_rank', 'prev_rank',
+                                                     'collected_at'])):
+    """t_keyword_rank row, kw_rank is None for a keyword leaving the ranking, prev_rank None for one entering it"""
+    __slots__ = ()
+    COLUMNS = ('source', 'category', 'keyword', 'kw_rank', 'prev_rank', 'collected_at')
+
+
+class KeywordPoller(object):
+    """
+    Snapshots every source's ranking at once and compares it with the previous snapshot per (source, category),
+    kept in memory and in a json file. A ranking identical to the previous one yields no rows
+
+    Examples:
+        >>> with KeywordPoller() as poller:
+        ...     poller.run(lambda changes: print(changes), interval=60)
+    """
+
+    def __init__(self, sources=SOURCES, path='.keyword_snapshots.json', timeout=10):
+        """
+        Args:
+            sources(tuple): keyword crawler classes taking session and timeout
+            path(str): json file path of the previous snapshots
+            timeout(int): seconds per request
+        """
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(sources), pool_maxsize=len(sources))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.crawlers = [source(session=self.session, timeout=timeout) for source in sources]
+        self.snapshots = SnapshotStore(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def key(source, category):
+        return '%s:%s' % (source, category)
+
+    def _fetch(self, crawler):
+        try:
+            return crawler.parse(crawler.fetch())
+        # a changed page layout fails one poll, not the service
+        except (requests.RequestException, AttributeError, ValueError) as e:
+            logger.error('%s ranking failed: %r' % (crawler.source, e))
+            return []
+
+    def poll(self, collected_at=None):
+        """fetch every source concurrently and compare its rankings with the snapshots.
+        a source that failed is left as it is, a failed fetch is not every keyword leaving the ranking
+        Args:
+            collected_at(datetime): timestamp of the snapshot, default now
+        Returns:
+            list: KeywordRank records of entries, exits and rank changes
+        """
+        collected_at = collected_at or datetime.now().replace(microsecond=0)
+
+        with ThreadPoolExecutor(max_workers=len(self.crawlers)) as executor:
+            results = list(zip(self.crawlers, executor.map(self._fetch, self.crawlers)))
+
+        rankings = defaultdict(dict)
+        categories = {}
+
+        for crawler, rows in results:
+            for category, rank, keyword in rows:
+                key = self.key(crawler.source, category)
+                rankings[key].setdefault(keyword, rank)
+                categories[key] = (crawler.source, category)
+
+        return [KeywordRank(*categories[key], keyword, rank, prev_rank, collected_at)
+                for key, keyword, rank, prev_rank in self.snapshots.compare(rankings)]
+
+    def save(self):
+        """make the rankings of every poll() the new snapshots and persist them"""
+        self.snapshots.save()
+
+    def run(self, write, interval=60, polls=None):
+        """poll every interval seconds on a fixed schedule, a poll slower than interval skips the missed ticks
+        Args:
+            write(callable): takes the KeywordRank records of one poll, only called when there are changes
+            interval(int): seconds between polls
+            polls(int): number of ticks, None to run until interrupted
+        """
+        started = time.monotonic()
+        tick = 0
+
+        while polls is None or tick < polls:
+
+            changes = self.poll()
+
+            if changes:
+                write(changes)
+
+            # the next poll compares with this snapshot only once it is written
+            self.save()
+            logger.info('%d keyword rank changes' % len(changes))
+
+            tick += 1
+            elapsed = time.monotonic() - started
+            missed = max(int(elapsed // interval) - tick + 1, 0)
+
+            if missed:
+                logger.warning('poll took longer than %ss, skipping %d ticks' % (interval, missed))
+                tick += missed
+
+            if polls is not None and tick >= polls:
+                break
+
+            time.sleep(max(started + tick * interval - time.monotonic(), 0))
+
+    def close(self):
+        self.session.close()
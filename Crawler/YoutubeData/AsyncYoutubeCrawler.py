@@ -0,0 +1,428 @@
+import asyncio
+import functools
+import json
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from dateutil.parser import parse
+
+import aiohttp
+
+from YoutubeData import parsers
+from YoutubeData.quota import KeyScheduler, QuotaExhausted
+from YoutubeData.watermark import cut
+
+logger = logging.getLogger(__name__)
+
+API_URL = 'https://www.googleapis.com/youtube/v3/'
+
+# _response resource name => REST path
+RESOURCES = {
+    'channels': 'channels',
+    'search': 'search',
+    'videos': 'videos',
+    'playlistitems': 'playlistItems',
+    'videocategories': 'videoCategories',
+    'commentThreads': 'commentThreads',
+    'comments': 'comments',
+}
+
+
+class AsyncYoutubeCrawler(object):
+    """
+    asyncio counterpart of YoutubeCrawler with the same public methods.
+    All calls share one keep-alive connection pool, concurrency is bounded per api key
+
+    Examples:
+        >>> async with AsyncYoutubeCrawler(api_list, concurrency=20) as yc:
+        ...     cvds = await yc.channel_video_desc(id=id_multi)
+    """
+
+    def __init__(self, api_key_list, concurrency=10, daily_limit=10000, quota_path='.quota_usage.json',
+                 base_url=API_URL, keepalive_timeout=30, timeout=60, retry_delay=1, cache=None, retries=5):
+        """
+        Args:
+            api_key_list (list): developer key list
+            concurrency(int): maximum in-flight requests per api key
+            daily_limit(int): quota units per key per day
+            quota_path(str): json file path for persisting quota usage, None for in-memory only
+            base_url(str): Youtube Data API v3 root url
+            keepalive_timeout(int): seconds an idle connection is kept open
+            timeout(int): total seconds for one request
+            retry_delay(int): seconds before the first retry of a failed request, doubled on every further retry
+            cache(ResponseCache): etag cache for list calls, None for no cache
+            retries(int): retries of a request failing with a connection error, a server error or a rate limit
+        """
+        self.scheduler = KeyScheduler(api_key_list, daily_limit=daily_limit, path=quota_path)
+        self.concurrency = concurrency
+        self.base_url = base_url
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.retries = retries
+        self.semaphores = {}
+        self._session = None
+        self.cache = cache
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def session(self):
+        """shared aiohttp session, created on first use inside the running loop"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency * len(self.scheduler.api_key_list),
+                                             keepalive_timeout=self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+        if self.cache is not None:
+            self.cache.close()
+
+        self.scheduler.close()
+
+    def _semaphore(self, key):
+        if key not in self.semaphores:
+            self.semaphores[key] = asyncio.Semaphore(self.concurrency)
+
+        return self.semaphores[key]
+
+    @staticmethod
+    async def _blocking(fn, *args):
+        """run fn in the default thread pool, quota file writes and sqlite cache calls stay off the loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+
+    async def _response(self, resource, **kwargs):
+        """
+        Args:
+            resource(str): youtube client method resource
+            **kwargs: Arbitrary keyword arguments.
+        Returns:
+            dict: response in dictionary form, None if the call cannot succeed:
+                  not found, forbidden, comments disabled, a bad request or a failure after every retry
+        Raises:
+            QuotaExhausted: every api key has spent its daily quota
+        """
+        params = {key: value for key, value in kwargs.items() if value}
+        url = self.base_url + RESOURCES[resource]
+
+        cached = await self._blocking(self.cache.get, resource, params) if self.cache is not None else None
+        headers = {'If-None-Match': cached[0]} if cached else None
+
+        attempt = 0
+
+        while True:
+
+            key = await self._blocking(self.scheduler.acquire, resource)
+
+            try:
+
+                async with self._semaphore(key):
+                    async with self.session.get(url, params=dict(params, key=key), headers=headers) as resp:
+                        status = resp.status
+                        content = await resp.read()
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error("%s %s" % (resource, e))
+                status, content = None, b''
+
+            if status == 200:
+                response = json.loads(content)
+
+                if self.cache is not None:
+                    await self._blocking(self.cache.set, resource, params, response)
+
+                return response
+
+            # not modified since the cached response
+            if status == 304 and cached:
+                await self._blocking(self.cache.touch, resource, params)
+                return cached[1]
+
+            if status is not None:
+                logger.error("%s %s %s" % (resource, status, content[:200]))
+
+            # parameter cannot found. mainly for removed videos' ids
+            if status == 404:
+                return
+
+            if status == 403:
+                reason = parsers.error_reason(content)
+
+                # exceeded quota for day, retried with the next key
+                if reason in parsers.QUOTA_REASONS:
+                    await self._blocking(self.scheduler.exhaust, key)
+                    continue
+
+                # forbidden, comments disabled, ... the same call fails with every key
+                if reason not in parsers.RATE_LIMIT_REASONS:
+                    return
+
+            # bad request, the same call fails with every key
+            elif status is not None and status < 500 and status != 429:
+                return
+
+            # connection error, server error or rate limit
+            if attempt >= self.retries:
+                logger.error('%s gave up after %d retries' % (resource, attempt))
+                return
+
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            attempt += 1
+
+    @staticmethod
+    def _split_list(l, n):
+        return [l[i:i + n] for i in range(0, len(l), n)]
+
+    async def channel_desc(self, id=None):
+        """Channel description method, see YoutubeCrawler.channel_desc"""
+        responses = await self._response('channels', part='snippet', id=id)
+
+        if responses is None:
+            return []
+
+        return [parsers.channel_desc(response) for response in responses['items']]
+
+    async def channel_countstats(self, id=None):
+        """Channel count statistics method, see YoutubeCrawler.channel_countstats"""
+        responses = await self._response('channels', part='statistics', id=id)
+
+        if responses is None:
+            return deque()
+
+        return deque(parsers.channel_countstats(response) for response in responses['items'])
+
+    async def _video_desc(self, ch_id, upload_id, update, days, watermark=None):
+        """video description list given by an upload id, see YoutubeCrawler._video_desc"""
+        next_page_token = ''
+        video_dict_list = deque()
+        # vid_published_at is utc without the 'Z'
+        stdd = datetime.utcnow() - timedelta(days=days + 1)
+
+        while True:
+
+            response = await self._response('playlistitems', playlistId=upload_id,
+                                            part='snippet',
+                                            maxResults=50,
+                                            pageToken=next_page_token)
+
+            if response is None:
+                break
+
+            video_dict = [parsers.playlist_item(item) for item in response['items']]
+
+            # update를 위한 경우
+            if update is True and watermark:
+
+                video_dict, reached = cut(video_dict, watermark)
+                video_dict_list.extend(video_dict)
+
+                if reached:
+                    break
+
+            else:
+                video_dict_list.extend(video_dict)
+
+                if update is True and (not video_dict or parse(video_dict[-1].vid_published_at) < stdd):
+                    break
+
+            if 'nextPageToken' not in response.keys():
+                break
+
+            next_page_token = response['nextPageToken']
+
+        if video_dict_list:
+            watermark = {'vid_id': video_dict_list[0].vid_id,
+                         'publishedAt': video_dict_list[0].vid_published_at}
+
+        return {
+            'ch_id': ch_id,
+            'upload_id': upload_id,
+            'video_info_list': video_dict_list,
+            'watermark': watermark
+        }
+
+    async def channel_video_desc(self, id=None, update=False, days=0, watermarks=None):
+        """video description list given by channel ids, see YoutubeCrawler.channel_video_desc
+        every uploads playlist is paged concurrently
+        """
+        responses = await self._response('channels', part='contentDetails', id=id)
+
+        if responses is None:
+            return []
+
+        ch_uploads_id = [parsers.channel_uploads(item) for item in responses['items']]
+
+        outputs = await asyncio.gather(*[self._video_desc(ch_id=ch_uploads['ch_id'],
+                                                          upload_id=ch_uploads['uploads_id'],
+                                                          update=update,
+                                                          days=days,
+                                                          watermark=watermarks.get(ch_uploads['ch_id'])
+                                                          if watermarks is not None else None)
+                                         for ch_uploads in ch_uploads_id])
+
+        return list(outputs)
+
+    async def _video_trend(self, rc, cid=0, cat_id_tot_list=None):
+        """trending video list given by region code and category id, see YoutubeCrawler._video_trend.
+        None if a page failed"""
+        pt = ''
+        dict_array = deque()
+        rank = 1
+
+        while True:
+
+            responses = await self._response('videos', part='snippet', chart='mostPopular',
+                                             regionCode=rc, pageToken=pt, maxResults=50,
+                                             videoCategoryId=cid)
+
+            # the chart is not available for this region and category, or the server gave up
+            if responses is None:
+                logger.error('trend chart %s:%s failed, left out' % (rc, cid))
+                return None
+
+            for item in responses['items']:
+
+                dict_array.append(parsers.video_trend(item, rc, cid, rank, cat_id_tot_list))
+                rank += 1
+
+            if 'nextPageToken' not in responses.keys():
+
+                return dict_array
+
+            pt = responses['nextPageToken']
+
+    async def video_trend(self, rc='KR', top=True):
+        """trending video list given by region code, see YoutubeCrawler.video_trend"""
+        responses = await self._response('videocategories', regionCode=rc, part='snippet')
+
+        # unknown region, only the overall chart is tried
+        if responses is None:
+            cat_id_list, cat_id_tot_list = {'0': 'ALL'}, {}
+
+        else:
+            cat_id_list, cat_id_tot_list = parsers.video_categories(responses)
+
+        if top is True:
+            return list(await self._video_trend(rc=rc, cid=0, cat_id_tot_list=cat_id_tot_list) or [])
+
+        results = await asyncio.gather(*[self._video_trend(rc=rc, cid=cat_id, cat_id_tot_list=cat_id_tot_list)
+                                         for cat_id in cat_id_list])
+
+        return [elem for elements in results if elements is not None for elem in elements]
+
+    async def _video_stats(self, vid, **kwargs):
+        """Video Statistics by video id(s), see YoutubeCrawler._video_stats"""
+        responses = await self._response('videos', id=vid, part='statistics', **kwargs)
+
+        if responses is None:
+            return deque()
+
+        return deque(parsers.video_stats(item) for item in responses['items'])
+
+    async def video_stats(self, vids):
+        """Video Statistics by video id(s), see YoutubeCrawler.video_stats"""
+        vid_split_list = self._split_list(vids.split(','), 50)
+
+        results = await asyncio.gather(*[self._video_stats(vid=','.join(vid_split))
+                                         for vid_split in vid_split_list])
+
+        outputs = deque()
+
+        for result in results:
+            outputs.extend(result)
+
+        return outputs
+
+    async def _replies(self, vid, parent_id, **kwargs):
+        """every reply of a comment thread"""
+        pt = ''
+        dict_comment_array = deque()
+
+        while True:
+
+            responses = await self._response('comments', part='snippet', parentId=parent_id,
+                                             maxResults=100, pageToken=pt, **kwargs)
+
+            if responses is None:
+                return dict_comment_array
+
+            for item in responses['items']:
+                dict_comment_array.append(parsers.comment(item['snippet'], vid, reply=True))
+
+            if 'nextPageToken' not in responses.keys():
+                return dict_comment_array
+
+            pt = responses['nextPageToken']
+
+    async def _comment(self, vid, **kwargs):
+        """Video comments by video id, see YoutubeCrawler._comment
+        inline replies are used when complete, other reply threads are fetched concurrently
+        """
+        pt = ''
+        dict_comment_array = deque()
+        parent_id_array = deque()
+
+        while True:
+
+            responses = await self._response('commentThreads', videoId=vid, part='snippet,replies',
+                                             maxResults=100, pageToken=pt, **kwargs)
+
+            # comments disabled or no comment at all
+            if not pt and (responses is None or not responses['items']):
+                dict_comment_array.append(parsers.empty_comment(vid))
+                return dict_comment_array
+
+            # a failed later page keeps the threads collected so far
+            if responses is None:
+                break
+
+            for item in responses['items']:
+
+                snippet = item['snippet']['topLevelComment']['snippet']
+                dict_comment_array.append(parsers.comment(snippet, vid, reply=False))
+
+                inline = item.get('replies', {}).get('comments', [])
+
+                # commentThreads returns at most 5 replies inline
+                if item['snippet']['totalReplyCount'] > len(inline):
+                    parent_id_array.append(item['id'])
+
+                else:
+                    dict_comment_array.extend(parsers.comment(reply['snippet'], vid, reply=True)
+                                              for reply in inline)
+
+            if 'nextPageToken' not in responses.keys():
+                break
+
+            pt = responses['nextPageToken']
+
+        replies = await asyncio.gather(*[self._replies(vid, parent_id, **kwargs)
+                                         for parent_id in parent_id_array])
+
+        for reply in replies:
+            dict_comment_array.extend(reply)
+
+        return dict_comment_array
+
+    async def comment(self, vids):
+        """Video comments by video id(s), see YoutubeCrawler.comment
+        every video is crawled concurrently, bounded by the per key concurrency
+        """
+        results = await asyncio.gather(*[self._comment(vid=vid) for vid in vids.split(',')])
+
+        outputs = deque()
+
+        for result in results:
+            outputs.extend(result)
+
+        return outputs
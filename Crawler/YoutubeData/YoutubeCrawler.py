@@ -1,30 +1,248 @@
 import logging
-from collections import deque
-from datetime import datetime, timedelta, timezone
+import queue
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
 from dateutil.parser import parse
-from multiprocessing import Pool
 
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from utils.iterables import chunks
+from YoutubeData import parsers
+from YoutubeData.categories import CategoryStore
+from YoutubeData.quota import KeyScheduler, QuotaExhausted, QuotaManager
+from YoutubeData.watermark import cut
+
 logger = logging.getLogger(__name__)
 
+# every part the channel level methods need, requested once per channel
+CHANNEL_PARTS = 'snippet,statistics,contentDetails'
+
+# iter_* job control messages
+_JOB_DONE = object()
+Spawn = namedtuple('Spawn', ['fn', 'kwargs'])
+
+# _response resource name => youtube client method
+RESOURCES = {
+    'channels': 'channels',
+    'search': 'search',
+    'videos': 'videos',
+    'playlistitems': 'playlistItems',
+    'videocategories': 'videoCategories',
+    'commentThreads': 'commentThreads',
+    'comments': 'comments',
+}
+
 
 class YoutubeCrawler(object):
     """
     Youtube data crawler based on Youtube Data Api v3
     """
 
-    def __init__(self, api_key_list, processes=10):
+    def __init__(self, api_key_list, processes=10, daily_limit=10000, quota_path='.quota_usage.json',
+                 backend='thread', memo_size=1000, cache=None, categories=None, retries=5, backoff=1):
         """
         Args:
             api_key_list (list): developer key list
-            processes(int): the number of processes
-            thread(bool): Thread use True instead of Process, default False
+            processes(int): the number of workers
+            daily_limit(int): quota units per key per day
+            quota_path(str): json file path for persisting quota usage, None for in-memory only
+            backend(str): 'thread' or 'process', workers of the shared executor.
+                          api calls are I/O bound so threads are the default.
+                          with 'process' the key scheduler runs in a manager process shared by every worker
+            memo_size(int): channels kept in the channels.list memo
+            cache(ResponseCache): etag cache for list calls, None for no cache
+            categories(CategoryStore): videoCategories maps per region, None for an in-memory store
+            retries(int): retries of a call answered with a server error or a rate limit
+            backoff(int): seconds before the first retry, doubled on every further retry
         """
-        self.api_key_iter = iter(api_key_list)
-        self.client = build("youtube", "v3", developerKey=next(self.api_key_iter))
+        if backend not in ('thread', 'process'):
+            raise ValueError("backend must be 'thread' or 'process', got %r" % backend)
+
+        if backend == 'process':
+            # a pickled KeyScheduler would count usage per worker and overwrite the file with stale counts
+            self._quota_manager = QuotaManager()
+            self._quota_manager.start()
+            self.scheduler = self._quota_manager.KeyScheduler(api_key_list, daily_limit=daily_limit, path=quota_path)
+
+        else:
+            self._quota_manager = None
+            self.scheduler = KeyScheduler(api_key_list, daily_limit=daily_limit, path=quota_path)
+
         self.processes = processes
+        self.backend = backend
+        self._executor = None
+        self._local = threading.local()
+        self.memo_size = memo_size
+        self._channel_memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self.cache = cache
+        self.categories = categories if categories is not None else CategoryStore(path=None)
+        self.retries = retries
+        self.backoff = backoff
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getstate__(self):
+        # executor and per thread clients stay in the parent process
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_quota_manager'] = None
+        state['_channel_memo'] = OrderedDict()
+        del state['_local']
+        del state['_memo_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+        self._memo_lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """shared worker pool, created on first use and kept until close()"""
+        if self._executor is None:
+
+            if self.backend == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.processes)
+
+        return self._executor
+
+    def close(self):
+        """shut down the shared worker pool, waiting for running calls, and write the quota usage"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        self.clear_memo()
+
+        if self.cache is not None:
+            self.cache.close()
+
+        if self._quota_manager is not None:
+            self.scheduler.close()
+            self._quota_manager.shutdown()
+            self._quota_manager = None
+
+        elif self.backend == 'thread':
+            self.scheduler.close()
+
+    def clear_memo(self):
+        """forget every memoized channels.list item"""
+        with self._memo_lock:
+            self._channel_memo.clear()
+
+    def _stream(self, jobs, max_pages=None, max_jobs=None):
+        """run page generators on the shared executor and yield their pages as they arrive.
+        workers block once max_pages pages wait, so memory is bounded by the queue depth.
+        jobs is read lazily, at most max_jobs of its jobs are submitted at a time.
+        a job may yield Spawn(fn, kwargs) to queue another job.
+        when a job raises, the running jobs stop after their current page, the pages they already fetched
+        are still yielded, then the first exception is raised
+        Args:
+            jobs(iterable): (generator function, kwargs) pairs
+            max_pages(int): pages waiting for the consumer, default 2 * processes
+            max_jobs(int): jobs of the iterable submitted and not finished, default 2 * processes
+        Yields:
+            pages in completion order
+        """
+        if self.backend != 'thread':
+            raise ValueError("iter_* methods need backend='thread'")
+
+        pages = queue.Queue(maxsize=max_pages or self.processes * 2)
+        stop = threading.Event()
+        failed = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def run(fn, kwargs):
+            try:
+                for page in fn(**kwargs):
+                    if not put(page) or failed.is_set():
+                        return
+            except BaseException as e:
+                put(e)
+            finally:
+                put(_JOB_DONE)
+
+        jobs = iter(jobs)
+        max_jobs = max_jobs or self.processes * 2
+        running = 0
+
+        def submit_next():
+            for fn, kwargs in jobs:
+                self.executor.submit(run, fn, kwargs)
+                return True
+            return False
+
+        error = None
+
+        try:
+            while running < max_jobs and submit_next():
+                running += 1
+
+            while running:
+                page = pages.get()
+
+                if page is _JOB_DONE:
+                    running -= 1
+
+                    if error is None and submit_next():
+                        running += 1
+
+                elif isinstance(page, Spawn):
+                    if error is None:
+                        self.executor.submit(run, page.fn, page.kwargs)
+                        running += 1
+
+                elif isinstance(page, BaseException):
+                    if error is None:
+                        error = page
+                        failed.set()
+
+                else:
+                    yield page
+
+            if error is not None:
+                raise error
+        finally:
+            # consumer stopped early or failed, release blocked workers
+            stop.set()
+
+    def _client(self, key):
+        """
+        Args:
+            key(str): developer key
+        Returns:
+            googleapiclient.discovery.Resource: youtube client built with the key.
+            httplib2 is not thread safe, so every thread keeps its own clients
+        """
+        clients = getattr(self._local, 'clients', None)
+
+        if clients is None:
+            clients = self._local.clients = {}
+
+        if key not in clients:
+            clients[key] = build("youtube", "v3", developerKey=key)
+
+        return clients[key]
 
     @staticmethod
     def _remove_empty_kwargs(**kwargs):
@@ -45,75 +263,88 @@ class YoutubeCrawler(object):
             resource(str): youtube client method resource
             **kwargs: Arbitrary keyword arguments.
         Returns:
-            dict: response in dictionary form
+            dict: response in dictionary form, None if the call cannot succeed:
+                  not found, forbidden, comments disabled, a bad request,
+                  or a server error or rate limit after every retry
+        Raises:
+            QuotaExhausted: every api key has spent its daily quota
         """
         kwargs = self._remove_empty_kwargs(**kwargs)
 
-        response = None
+        cached = self.cache.get(resource, kwargs) if self.cache is not None else None
+
+        attempt = 0
 
-        while not response:
+        while True:
+
+            # raises QuotaExhausted when every key is spent
+            key = self.scheduler.acquire(resource)
+            client = self._client(key)
 
             try:
 
-                if resource == 'channels':
-                    response = self.client.channels().list(
-                        **kwargs
-                    ).execute()
-
-                if resource == 'search':
-                    response = self.client.search().list(
-                        **kwargs
-                    ).execute()
-
-                if resource == 'videos':
-                    response = self.client.videos().list(
-                        **kwargs
-                    ).execute()
-
-                if resource == 'playlistitems':
-                    response = self.client.playlistItems().list(
-                        **kwargs
-                    ).execute()
-
-                if resource == 'videocategories':
-                    response = self.client.videoCategories().list(
-                        **kwargs
-                    ).execute()
-                    
-                if resource == 'commentThreads':
-                    response = self.client.commentThreads().list(
-                        **kwargs
-                    ).execute()
-                    
-                if resource == 'comments':
-                    response = self.client.comments().list(
-                        **kwargs
-                    ).execute()
-                    
+                request = getattr(client, RESOURCES[resource])().list(
+                    **kwargs
+                )
+
+                if cached:
+                    request.headers['If-None-Match'] = cached[0]
+
+                response = request.execute()
+
+                if self.cache is not None:
+                    self.cache.set(resource, kwargs, response)
+
+                return response
+
             except HttpError as e:
-                
+
+                status = e.resp.status
+
+                # not modified since the cached response
+                if status == 304 and cached:
+
+                    self.cache.touch(resource, kwargs)
+
+                    return cached[1]
+
                 logger.error("%s" % e)
                 
                 # parameter cannot found. mainly for removed videos' ids
-                if e.resp.status == 404:
+                if status == 404:
                     
                     return
                     
-                if e.resp.status == 403:
-                    
-                    # comment disabled
-                    if b'disabled comments' in e.content:
-                        
+                if status == 403:
+
+                    reason = parsers.error_reason(e.content)
+
+                    # exceeded quota for day, retried with the next key
+                    if reason in parsers.QUOTA_REASONS:
+
+                        self.scheduler.exhaust(key)
+
+                        continue
+
+                    # forbidden, comments disabled, ... the same call fails with every key
+                    if reason not in parsers.RATE_LIMIT_REASONS:
+
                         return
-                    
-                    # exceeded quota for day
-                    elif b'quota' in e.content:
-                       
-                        self.client = build("youtube", "v3", developerKey=next(self.api_key_iter))
-                
-                pass
 
-        return response
+                # bad request, the same call fails with every key
+                elif status < 500 and status != 429:
+
+                    return
+
+                # server error or rate limit
+                if attempt >= self.retries:
+
+                    logger.error('%s gave up after %d retries' % (resource, attempt))
+
+                    return
+
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
 
     @staticmethod
     def _split_list(l, n):
@@ -131,102 +362,128 @@ class YoutubeCrawler(object):
 
         return split_list
 
+    def _channel_items(self, id):
+        """channels items with snippet, statistics and contentDetails parts.
+        ids already requested in this run are served from the memo
+        Args:
+            id(str): channel_id(s), comma joined
+        Returns:
+            list: channels items in id order, unknown ids are left out
+        """
+        ids = id.split(',')
+        items = {}
+
+        with self._memo_lock:
+            for ch_id in ids:
+                if ch_id in self._channel_memo:
+                    self._channel_memo.move_to_end(ch_id)
+                    items[ch_id] = self._channel_memo[ch_id]
+
+        missing = [ch_id for ch_id in OrderedDict.fromkeys(ids) if ch_id not in items]
+
+        for ids_50 in self._split_list(missing, 50):
+
+            responses = self._response('channels', part=CHANNEL_PARTS, id=','.join(ids_50))
+            fetched = {item['id']: item for item in responses['items']} if responses else {}
+
+            with self._memo_lock:
+                for ch_id in ids_50:
+                    # None for removed channels so they are not requested again
+                    items[ch_id] = self._channel_memo[ch_id] = fetched.get(ch_id)
+
+                while len(self._channel_memo) > self.memo_size:
+                    self._channel_memo.popitem(last=False)
+
+        return [items[ch_id] for ch_id in ids if items[ch_id] is not None]
+
+    def channel_info(self, id=None):
+        """Channel description, count statistics and uploads playlist with one channels.list call
+        Args:
+            id(str): channel_id(s), comma joined
+        Returns:
+            dict: {'desc': channel_desc list, 'stats': channel_countstats deque, 'uploads': upload id list}
+        Examples:
+            >>> channel_info(id=channel_id)
+            {'desc': [{'title': channel_title, 'ch_id': channel_id, ...}, ...],
+             'stats': deque([{'ch_id': channel_id, 'subscriberCount': int;None, ...}, ...]),
+             'uploads': [{'ch_id': channel_id, 'uploads_id': upload_id}, ...]}
+        """
+        items = self._channel_items(id)
+
+        return {'desc': [parsers.channel_desc(item) for item in items],
+                'stats': deque(parsers.channel_countstats(item) for item in items),
+                'uploads': [parsers.channel_uploads(item) for item in items]}
+
     def channel_desc(self, id=None):
-        """Channel description method
+        """Channel description method, a view over channel_info
         Args:
             id(str): channel_id
         Returns:
-            list: dictionary array
+            list: ChannelDesc records
         Examples:
             >>> channel_description(id=channel_id)
-            [{'title': channel_title,
-            'ch_id': channel_id,
-            'description': channel_description,
-             'publisehdAt': channel_created_date}, ...]
+            [ChannelDesc(ch_title, ch_id, ch_desc, ch_published_at, ch_thumb), ...]
         """
-        responses = self._response('channels', part='snippet', id=id)
-
-        desc_date_list = [{'title': response['snippet']['title'],
-                           'ch_id': response['id'],
-                           'description': response['snippet']['description'],
-                           'publishedAt': response['snippet']['publishedAt'][:10],
-                           'thumbnails': response['snippet']['thumbnails']}
-
-                          for response in responses['items']]
-
-        return desc_date_list
+        return self.channel_info(id=id)['desc']
 
     def channel_countstats(self, id=None):
-        """Channel count statistics method
+        """Channel count statistics method, a view over channel_info
         Args:
             id(str): channel_id
         Returns:
-            list: dictionary array
+            deque: ChannelStats records
         Examples:
             >>> channel_countstats(id=channel_id)
-            [{'ch_id': str,
-            'subscriberCount': int;None,
-            'viewCount': int,
-            'videoCount': int,
-            'sub_view_ratio': float;None}, ...]
+            deque([ChannelStats(ch_id=str, ch_n_sub=int;None, ch_n_view=int, ch_n_video=int,
+                                ch_n_cmt=int, sub_view_ratio=float;None), ...])
         """
-        responses = self._response('channels', part='statistics', id=id)
-
-        result_list = deque()
-
-        for response in responses['items']:
-
-            ch_id = response['id']
-
-            statistics_response = response['statistics']
-
-            view_count = int(statistics_response['viewCount'])
-            video_count = int(statistics_response['videoCount'])
-            comment_count = int(statistics_response['commentCount'])
-
-            if statistics_response['hiddenSubscriberCount'] is True:
-
-                subscriber_count = None
-                sub_view_ratio = None
-
-            else:
+        return self.channel_info(id=id)['stats']
 
-                subscriber_count = int(statistics_response['subscriberCount'])
-
-                try:
-                    sub_view_ratio = view_count / subscriber_count
-                except ZeroDivisionError:
-                    sub_view_ratio = None
-
-            result_list.append({'ch_id': ch_id, 'subscriberCount': subscriber_count,
-                                'viewCount': view_count, 'videoCount': video_count,
-                                'sub_view_ratio': sub_view_ratio, 'comment_count': comment_count})
-
-        return result_list
-
-    def _video_desc(self, ch_id, upload_id, update, days):
+    def _video_desc(self, ch_id, upload_id, update, days, watermark=None):
         """video description list given by an upload id
         Args:
             ch_id(str): channel_id
             upload_id(str): upload_id
             update(bool): True if requesting video data created after N days ago
-            days(int): N days
+            days(int): N days, used when the channel has no watermark yet
+            watermark(dict): newest known video of the channel, {'vid_id': str, 'publishedAt': str}.
+                             in update mode paging stops at the first page containing it
         Returns:
             dict
         Examples:
             >>> _video_desc(ch_id, upload_id)
             {'ch_id': channel_id,
              'upload_id': upload_id,
-             'video_info_list': [{'channelId': channel_id,
-                                  'videoId': video_id,
-                                  'title': video title,
-                                  'description': video description,
-                                  'publishedAt': video published time,
-                                  'thumbnails': video thumbnail_urls}, ...]}
-        """
-        next_page_token = ''
+             'video_info_list': [VideoDesc(ch_id, upload_id, vid_id, vid_title, vid_desc,
+                                           vid_published_at, vid_th), ...],
+             'watermark': {'vid_id': newest video_id, 'publishedAt': its published time}}
+        """
         video_dict_list = deque()
 
+        for video_dict, _ in self._video_desc_pages(upload_id, update, days, watermark):
+            video_dict_list.extend(video_dict)
+
+        if video_dict_list:
+            watermark = {'vid_id': video_dict_list[0].vid_id,
+                         'publishedAt': video_dict_list[0].vid_published_at}
+
+        return {
+            'ch_id': ch_id,
+            'upload_id': upload_id,
+            'video_info_list': video_dict_list,
+            'watermark': watermark
+        }
+
+    def _video_desc_pages(self, upload_id, update, days, watermark=None, page_token=''):
+        """uploads playlist pages, see _video_desc
+        Args:
+            page_token(str): page to start from, '' for the first page
+        Yields:
+            tuple: (VideoDesc records of one page, newest first, token of the next page,
+                    None on the last page. paging stops early when a call fails)
+        """
+        next_page_token = page_token
+
         while True:
 
             response = self._response('playlistitems', playlistId=upload_id,
@@ -234,118 +491,202 @@ class YoutubeCrawler(object):
                                       maxResults=50,
                                       pageToken=next_page_token)
 
-            video_dict = [{'channelId': item['snippet']['channelId'],
-                           'videoId': item['snippet']['resourceId']['videoId'],
-                           'title': item['snippet']['title'],
-                           'description': item['snippet']['description'],
-                           'publishedAt': item['snippet']['publishedAt'],
-                           'thumbnails': item['snippet']['thumbnails']
-                           }
-                          for item in response['items']]
+            if response is None:
+                return
 
-            video_dict_list.extend(video_dict)
+            video_dict = [parsers.playlist_item(item) for item in response['items']]
+            next_page_token = response.get('nextPageToken')
 
             # update를 위한 경우
-            if update is True:
+            if update is True and watermark:
 
-                try:
+                video_dict, reached = cut(video_dict, watermark)
 
-                    vid_pub_at = video_dict[-1]['publishedAt']
+                if reached:
+                    yield video_dict, None
+                    return
 
-                    vid_pub_at_dt = parse(vid_pub_at)
+                yield video_dict, next_page_token
 
-                    utc_now = datetime.now(timezone.utc)
-                    stdd = utc_now - timedelta(days=days + 1)
+            elif update is True:
 
-                    if vid_pub_at_dt < stdd:
-                        return {
-                            'ch_id': ch_id,
-                            'upload_id': upload_id,
-                            'video_info_list': video_dict_list
-                        }
-                except IndexError:
-                    return {
-                        'ch_id': ch_id,
-                        'upload_id': upload_id,
-                        'video_info_list': video_dict_list
-                    }
+                stdd = datetime.utcnow() - timedelta(days=days + 1)
 
-            if 'nextPageToken' in response.keys():
-                next_page_token = response['nextPageToken']
+                # vid_published_at is utc without the 'Z'
+                if not video_dict or parse(video_dict[-1].vid_published_at) < stdd:
+                    yield video_dict, None
+                    return
+
+                yield video_dict, next_page_token
 
             else:
+                yield video_dict, next_page_token
+
+            if not next_page_token:
+                return
+
+    def _video_desc_job(self, ch_id, upload_id, update, days, watermark=None, page_token='', newest=None):
+        """iter_channel_video_desc job, _video_desc pages with a flag on the channel's last page.
+        every page is yielded as soon as it is fetched, an empty last page closes a channel whose paging failed
+        Args:
+            page_token(str): page to start from when resuming a channel
+            newest(dict): watermark of the channel's newest video, kept from the first page of a resumed crawl
+        """
+        for video_dict, next_page_token in self._video_desc_pages(upload_id, update, days, watermark, page_token):
 
-                return {
-                    'ch_id': ch_id,
-                    'upload_id': upload_id,
-                    'video_info_list': video_dict_list
-                }
+            if newest is None and video_dict:
+                newest = {'vid_id': video_dict[0].vid_id,
+                          'publishedAt': video_dict[0].vid_published_at}
 
-    def channel_video_desc(self, id=None, update=False, days=0):
+            yield {'ch_id': ch_id, 'upload_id': upload_id, 'video_info_list': video_dict,
+                   'watermark': newest or watermark, 'next_page_token': next_page_token,
+                   'last': next_page_token is None}
+
+            if next_page_token is None:
+                return
+
+        yield {'ch_id': ch_id, 'upload_id': upload_id, 'video_info_list': [],
+               'watermark': newest or watermark, 'next_page_token': None, 'last': True}
+
+    def channel_video_desc(self, id=None, update=False, days=0, watermarks=None):
         """video description list given by channel ids
-        channel ids => upload ids => MultiThreading => video description list by upload ids
+        channel ids => upload ids => shared executor => video description list by upload ids
         Args:
              id(str): channel_id
              update(bool): True if requesting video data created after N days ago
              days(int): N days
+             watermarks(WatermarkStore): newest known video per channel, read only here.
+                                         update it with the returned 'watermark' after writing
         Returns:
             list: dictionary array
         Examples:
             >>>channel_video_desc(id=channel_id)
             [{'ch_id': channel_id,
               'upload_id': upload_id,
-              'video_info_list': [{'channelId': channel_id,
-                                   'videoId': video_id,
-                                   'title': video title,
-                                   'description': video description,
-                                   'publishedAt': video published time,
-                                   'thumbnails': video thumbnail_urls
-                                   }, ...]}, ...]
+              'video_info_list': [VideoDesc(ch_id, upload_id, vid_id, vid_title, vid_desc,
+                                            vid_published_at, vid_th), ...],
+              'watermark': {'vid_id': newest video_id, 'publishedAt': its published time}}, ...]
         """
 
-        responses = self._response('channels', part='contentDetails', id=id)
-
-        ch_uploads_id = [{'ch_id': item['id'],
-                          'uploads_id': item['contentDetails']['relatedPlaylists']['uploads']}
-                         for item in responses['items']]
+        ch_uploads_id = self.channel_info(id=id)['uploads']
         results = deque()
 
-        pool = Pool(self.processes)
-
         for ch_uploads in ch_uploads_id:
             upload_id = ch_uploads['uploads_id']
             ch_id = ch_uploads['ch_id']
 
-            ready = pool.apply_async(self._video_desc,
-                                     kwds={
-                                         'ch_id': ch_id,
-                                         'upload_id': upload_id,
-                                         'update': update,
-                                         'days': days
-                                     })
+            ready = self.executor.submit(self._video_desc,
+                                         ch_id=ch_id,
+                                         upload_id=upload_id,
+                                         update=update,
+                                         days=days,
+                                         watermark=watermarks.get(ch_id) if watermarks is not None else None)
             results.append(ready)
 
-        outputs = [p.get() for p in results]
+        outputs = [p.result() for p in results]
 
         return outputs
 
-    def _video_trend(self, rc, cid=0):
+    def iter_channel_video_desc(self, id=None, update=False, days=0, watermarks=None, max_pages=None,
+                                page_tokens=None):
+        """streaming channel_video_desc, uploads playlist pages are yielded as they arrive
+        Args:
+             id(str): channel_id
+             update(bool): True if requesting video data created after N days ago
+             days(int): N days
+             watermarks(WatermarkStore): newest known video per channel, read only here
+             max_pages(int): pages waiting for the consumer
+             page_tokens(RunJournal): {'token': next_page_token, 'watermark': watermark} per channel
+                                      of an interrupted crawl, the channel continues from that page
+        Yields:
+            dict: {'ch_id': channel_id, 'upload_id': upload_id, 'video_info_list': one page,
+                   'watermark': newest video of the channel,
+                   'next_page_token': page after this one, None on the last page,
+                   'last': True on the channel's last page, update watermarks after writing it}
+        """
+        ch_uploads_id = self.channel_info(id=id)['uploads']
+        jobs = deque()
+
+        for ch_uploads in ch_uploads_id:
+
+            ch_id = ch_uploads['ch_id']
+            state = page_tokens.get(ch_id) if page_tokens is not None else None
+
+            jobs.append((self._video_desc_job, {'ch_id': ch_id,
+                                                'upload_id': ch_uploads['uploads_id'],
+                                                'update': update,
+                                                'days': days,
+                                                'watermark': watermarks.get(ch_id) if watermarks is not None else None,
+                                                'page_token': state['token'] if state else '',
+                                                'newest': state['watermark'] if state else None}))
+
+        return self._stream(jobs, max_pages=max_pages)
+
+    def video_categories(self, rc='KR'):
+        """video categories of a region, served from the category store for a day
+        Args:
+             rc(str): region code, 2 Characters
+        Returns:
+            tuple: ({assignable category id: title, '0': 'ALL'}, {category id: title})
+        """
+        categories = self.categories.get(rc)
+
+        if categories is None:
+
+            responses = self._response('videocategories', regionCode=rc, part='snippet')
+
+            # unknown region, only the overall chart is tried and nothing is stored
+            if responses is None:
+                return {'0': 'ALL'}, {}
+
+            categories = parsers.video_categories(responses)
+            self.categories.set(rc, *categories)
+
+        return categories
+
+    def _video_trend(self, rc, cid=0, cat_id_tot_list=None):
         """trending video list given by region code and category id
         Args:
              rc(str): region code, 2 Characters
              cid(int): youtube video category code
+             cat_id_tot_list(dict): category id => title, vid_cat is None without it
         Returns:
-            list: dictionary array
+            deque: VideoTrend records, None if a page failed. part of a chart would read as videos leaving it
         Examples:
             >>>_video_trend(rc='KR', cid=0)
-            [{'vid_id': videoId, 'vid_published_at': published_at,
-              'ch_id': channelId, 'vid_title': vid_title, 'vid_desc': vid_description,
-              'vid_th': vid_th, 'ch_title': ch_title, 'vid_tags': vid_tags,
-               'vid_cat_id': categoryId, 'region_code': rc, 'vid_rank': rank,'vid_trend_cat': cid
-              }, ...]
+            deque([VideoTrend(vid_id, vid_published_at, ch_id, vid_title, vid_desc, vid_th, ch_title,
+                              vid_tags, vid_cat_id, region_code, None, vid_rank, vid_trend_cat), ...])
         """
-        pt = ''
         dict_array = deque()
+
+        for page in self._video_trend_pages(rc, cid, cat_id_tot_list):
+
+            if page is None:
+                logger.error('trend chart %s:%s failed, left out' % (rc, cid))
+                return None
+
+            dict_array.extend(page)
+
+        return dict_array
+
+    def _video_trend_job(self, rc, cid=0, cat_id_tot_list=None):
+        """iter_video_trend job, a complete chart as one page"""
+        chart = self._video_trend(rc, cid, cat_id_tot_list)
+
+        if chart is not None:
+            yield list(chart)
+
+    def _video_trend_pages(self, rc, cid=0, cat_id_tot_list=None):
+        """chart pages, see _video_trend
+        Args:
+             rc(str): region code, 2 Characters
+             cid(int): youtube video category code
+             cat_id_tot_list(dict): category id => title, sets vid_cat when given
+        Yields:
+            list: VideoTrend records of one page, None once a call failed:
+                  the chart is not available for this region and category, or the server gave up
+        """
+        pt = ''
         rank = 1
 
         while True:
@@ -354,41 +695,24 @@ class YoutubeCrawler(object):
                                        regionCode=rc, pageToken=pt, maxResults=50,
                                        videoCategoryId=cid)
 
-            for item in responses['items']:
+            if responses is None:
+                yield None
+                return
 
-                videoId = item['id']
-                published_at = item['snippet']['publishedAt']
-                channelId = item['snippet']['channelId']
-                vid_title = item['snippet']['title']
-                vid_description = item['snippet']['description']
-                vid_th = item['snippet']['thumbnails']
-                ch_title = item['snippet']['channelTitle']
+            page = []
 
-                if 'tags' in item['snippet'].keys():
-                    vid_tags = ','.join(item['snippet']['tags'])
-
-                else:
-                    vid_tags = ''
-
-                categoryId = item['snippet']['categoryId']
+            for item in responses['items']:
 
-                vid_dict = {'vid_id': videoId, 'vid_published_at': published_at,
-                            'ch_id': channelId, 'vid_title': vid_title,
-                            'vid_desc': vid_description, 'vid_th': vid_th,
-                            'ch_title': ch_title, 'vid_tags': vid_tags,
-                            'vid_cat_id': categoryId, 'region_code': rc, 'vid_rank': rank,
-                            'vid_trend_cat': cid
-                            }
+                page.append(parsers.video_trend(item, rc, cid, rank, cat_id_tot_list))
                 rank += 1
-                dict_array.append(vid_dict)
 
-            if 'nextPageToken' not in responses.keys():
+            yield page
 
-                return dict_array
+            if 'nextPageToken' not in responses.keys():
 
-            else:
+                return
 
-                pt = responses['nextPageToken']
+            pt = responses['nextPageToken']
 
     def video_trend(self, rc='KR', top=True):
         """trending video list given by region code and category id
@@ -397,102 +721,100 @@ class YoutubeCrawler(object):
              top(bool): Default True, True if want only top 200 video
                         False if want all possible category popular video
         Returns:
-            list: dictionary array
+            list: VideoTrend records
         Examples:
             >>>video_trend(rc='KR', top=True)
-            [{'vid_id': videoId, 'vid_published_at': published_at,
-              'ch_id': channelId, 'vid_title': vid_title, 'vid_desc': vid_description,
-              'vid_th': vid_th, 'ch_title': ch_title, 'vid_tags': vid_tags,
-               'vid_cat_id': categoryId, 'region_code': rc, 'vid_rank': rank,'vid_trend_cat': cid
-              }, ...]
+            [VideoTrend(vid_id, vid_published_at, ch_id, vid_title, vid_desc, vid_th, ch_title,
+                        vid_tags, vid_cat_id, region_code, vid_cat, vid_rank, vid_trend_cat), ...]
         """
-        responses = self._response('videocategories', regionCode='US', part='snippet')
+        cat_id_list, cat_id_tot_list = self.video_categories(rc)
 
-        cat_id_list = {item['id']: item['snippet']['title']
-                       for item in responses['items'] if item['snippet']['assignable'] is True}
+        if top is True:
 
-        cat_id_tot_list = {item['id']: item['snippet']['title'] for item in responses['items']}
+            return list(self._video_trend(rc=rc, cid=0, cat_id_tot_list=cat_id_tot_list) or [])
 
-        cat_id_list['0'] = 'ALL'
+        else:
 
-        pool = Pool(self.processes)
+            results = deque()
 
-        if top is True:
+            for cat_id in cat_id_list:
+                ready = self.executor.submit(self._video_trend, rc=rc, cid=cat_id, cat_id_tot_list=cat_id_tot_list)
+                results.append(ready)
 
-            most_popular_video_list = self._video_trend(rc=rc, cid=0)
+            outputs = [p.result() for p in results]
 
-            for most_popular_video in most_popular_video_list:
-                most_popular_video['vid_cat'] = cat_id_tot_list[most_popular_video['vid_cat_id']]
+            return [elem for elements in outputs if elements is not None for elem in elements]
 
-            return most_popular_video_list
+    def video_trend_regions(self, rcs, top=True):
+        """trending video list of many regions, every (region, category) chart is a task on the shared executor
+        Args:
+             rcs(list): region codes, 2 Characters each
+             top(bool): True if want only top 200 video per region
+                        False if want all possible category popular video
+        Returns:
+            list: VideoTrend records, region by region in the given order.
+                  a chart with a failed page is left out, so its previous snapshot is kept
+        """
+        categories = dict(zip(rcs, self.executor.map(self.video_categories, rcs)))
 
-        else:
+        results = deque()
 
-            results = deque()
+        for rc in rcs:
 
-            for cat_id in cat_id_list:
-                ready = pool.apply_async(self._video_trend,
-                                         kwds={'rc': rc, 'cid': cat_id})
+            cat_id_list, cat_id_tot_list = categories[rc]
+
+            for cat_id in ([0] if top is True else cat_id_list):
+                ready = self.executor.submit(self._video_trend, rc=rc, cid=cat_id, cat_id_tot_list=cat_id_tot_list)
                 results.append(ready)
 
-            outputs = [p.get() for p in results]
+        return [elem for p in results for elem in (p.result() or ())]
+
+    def iter_video_trend(self, rc='KR', top=True):
+        """streaming video_trend, charts are yielded as they complete
+        Args:
+             rc(str): region code, 2 Characters
+             top(bool): True if want only top 200 video
+        Yields:
+            list: VideoTrend records of one complete chart, a chart with a failed page is left out
+        """
+        cat_id_list, cat_id_tot_list = self.video_categories(rc)
 
-            outputs = [elem for elements in outputs for elem in elements]
+        cat_ids = [0] if top is True else list(cat_id_list)
 
-            for output in outputs:
-                output['vid_cat'] = cat_id_tot_list[output['vid_cat_id']]
+        return self._stream((self._video_trend_job, {'rc': rc, 'cid': cat_id, 'cat_id_tot_list': cat_id_tot_list})
+                            for cat_id in cat_ids)
 
-            return outputs
-        
     def _video_stats(self, vid, **kwargs):
         """Video Statistics by video id(s)
         Args:
              vid(str): Youtube video id(s), maximum 50 ids possible
         Returns:
-            deque: dictionary array
+            deque: VideoStats records
         Examples:
             >>>_video_stats(vid=''_S64IMfIod8,_s66WPKCEd8, ...')
-                deque([{'viewCount': '17133', 'likeCount': '83', 'dislikeCount': '0',
-                        'favoriteCount': '0', 'commentCount': '45', 'vid_id': '_S64IMfIod8'},
-                        {'viewCount': '23', 'likeCount': '0', 'dislikeCount': '0',
-                        'favoriteCount': '0', 'commentCount': '0', 'vid_id': '_s66WPKCEd8'}, ...])
+                deque([VideoStats(vid_id='_S64IMfIod8', view_count=17133, like_count=83, dislike_count=0,
+                                  favorite_count=0, comment_count=45), ...])
         """
         responses = self._response('videos', id=vid, part='statistics', **kwargs)
+
+        if responses is None:
+            return deque()
         
-        vid_stats_dict_list = deque()
-        
-        key_require = set(['viewCount', 'likeCount', 'dislikeCount', 'favoriteCount', 'commentCount'])
-        
-        for item in responses['items']:
-            
-            vid_stats_dict = item['statistics']
-            
-            key_has = set(item['statistics'].keys())
-            empty_keys = key_require - key_has
-            
-            # if there is any empty key
-            if empty_keys:
-                for key in empty_keys:
-                    vid_stats_dict[key] = None
-                    
-            vid_stats_dict['vid_id'] = item['id']
-            vid_stats_dict_list.append(vid_stats_dict)
+        vid_stats_dict_list = deque(parsers.video_stats(item) for item in responses['items'])
             
         return vid_stats_dict_list
     
     def video_stats(self, vids):
         """Video Statistics by video id(s)
-        video ids => split into list with 50 vids elements as string => Multiprocessing
+        video ids => split into list with 50 vids elements as string => shared executor
         Args:
              vids(str): Youtube video id(s), no length limit
         Returns:
-            deque: dictionary array
+            deque: VideoStats records
         Examples:
             >>>video_stats(vid='_S64IMfIod8,_s66WPKCEd8, ...')
-                deque([{'viewCount': '17133', 'likeCount': '83', 'dislikeCount': '0',
-                        'favoriteCount': '0', 'commentCount': '45', 'vid_id': '_S64IMfIod8'},
-                        {'viewCount': '23', 'likeCount': '0', 'dislikeCount': '0',
-                        'favoriteCount': '0', 'commentCount': '0', 'vid_id': '_s66WPKCEd8'}, ...])
+                deque([VideoStats(vid_id='_S64IMfIod8', view_count=17133, like_count=83, dislike_count=0,
+                                  favorite_count=0, comment_count=45), ...])
         """
         vid_list = vids.split(',')
         
@@ -500,181 +822,333 @@ class YoutubeCrawler(object):
         
         vid_split_list_50 = [','.join(item) for item in vid_split_list]
         
-        pool = Pool(self.processes)
-        
-        results = [pool.apply_async(self._video_stats, kwds={'vid': id_join_50}) 
-                                            for id_join_50 in vid_split_list_50]
+        results = [self.executor.submit(self._video_stats, vid=id_join_50)
+                   for id_join_50 in vid_split_list_50]
         
         outputs = deque()
         
         for p in results:
             
-            outputs.extend(p.get())
+            outputs.extend(p.result())
         
         return outputs
     
-    def _comment(self, vid, **kwargs):
-        """Video comments by video id
+    def _video_stats_job(self, vid):
+        yield self._video_stats(vid=vid)
+
+    def iter_video_stats(self, vids, max_pages=None):
+        """streaming video_stats, one page per 50 video ids
+        Args:
+             vids(iterable): Youtube video ids, e.g. a streamed query. read 50 at a time as calls finish,
+                             a comma joined str is split
+             max_pages(int): pages waiting for the consumer
+        Yields:
+            deque: VideoStats records, see video_stats
+        """
+        if isinstance(vids, str):
+            vids = vids.split(',')
+
+        return self._stream(((self._video_stats_job, {'vid': ','.join(vid_split)})
+                             for vid_split in chunks(vids, 50)), max_pages=max_pages)
+
+    def _comment_threads(self, vid, cursor=None, **kwargs):
+        """Top level comments and inline replies of a video, newest first
         Args:
              vid(str): Youtube video id
+             cursor(dict): state of the previous crawl, see CommentCursorStore.get.
+                           paging stops at the first already seen comment and only threads
+                           whose totalReplyCount changed are crawled again
         Returns:
-            deque: dictionary array
-        Examples:
-            >>>_comment(vid='DxfEdD7JpcE')
-                deque([{'author_name': '강성민', 'author_img': 'https://yt3.ggpht.com/-ljpkNvLx6Ng/AAAAAAAAAAI/AAAAAAAAAAA/8dFlKZ5AGWM/s28-c-k-no-mo-rj-c0xffffff/photo.jpg',
-                        'author_id': 'UC963kbRm1ZOm68jDXkZSpDQ','vid_id': 'DxfEdD7JpcE', 'comment': '솔직히 말하면 쯔양님이 이긴거아니냐', 'n_like': 0, 'publishedAt': '2019-02-11T12:00:56.000',
-                        'replyType': False},
-                       {'author_name': '뿌 뿌', 'author_img': 'https://yt3.ggpht.com/-WxJvhks7ZMo/AAAAAAAAAAI/AAAAAAAAAAA/Hts2w2qzm4Q/s28-c-k-no-mo-rj-c0xffffff/photo.jpg',
-                        'author_id': 'UCasr8l5uCtxH6zxspy-cg1Q', 'vid_id': 'DxfEdD7JpcE', 'comment': '아니 걍 노답이다', 'n_like': 1, 'publishedAt': '2019-02-11T02:03:16.000',
-                        'replyType': False},,])
+            tuple: (deque of Comment records, parent ids whose replies are not all inline, new cursor)
         """
-        pt = ''
         dict_comment_array = deque()
-        
         parent_id_array = deque()
-        
-        key_require = set(['authorDisplayName', 'authorProfileImageUrl', 'authorChannelId', 
-                   'textDisplay', 'likeCount', 'publishedAt'])
-        
+        new_cursor = None
+
+        for comments, parent_ids, _, new_cursor in self._comment_thread_pages(vid, cursor=cursor, **kwargs):
+            dict_comment_array.extend(comments)
+            parent_id_array.extend(parent_ids)
+
+        return dict_comment_array, parent_id_array, new_cursor
+
+    def _comment_thread_pages(self, vid, cursor=None, page_token='', new_cursor=None, **kwargs):
+        """commentThreads pages, see _comment_threads
+        Args:
+             vid(str): Youtube video id
+             cursor(dict): state of the previous crawl
+             page_token(str): page to start from when resuming a video
+             new_cursor(dict): cursor built by the pages before page_token
+        Yields:
+            tuple: (deque of Comment records, parent ids whose replies are not all inline,
+                    token of the next page or None, new cursor so far)
+        """
+        pt = page_token
+
+        known_replies = cursor['replies'] if cursor else {}
+        new_cursor = new_cursor or {'newest': cursor['newest'] if cursor else None,
+                                    'newest_id': cursor['newest_id'] if cursor else None,
+                                    'replies': {}}
+        reached = False
+
         while True:
-            responses = self._response('commentThreads', videoId=vid, part='snippet', 
+            responses = self._response('commentThreads', videoId=vid, part='snippet,replies', order='time',
                                        maxResults=100, pageToken=pt, **kwargs)
-            
-            return responses
-            
-            if responses is None or not responses['items']:
-                dict_comment = dict()
-                dict_comment['vid_id'] = vid
-                dict_comment['replyType'] = False
-                
-                for key in key_require:
-                    dict_comment[key] = None
-                
-                dict_comment_array.append(dict_comment)
-                return dict_comment_array
-            
+
+            dict_comment_array = deque()
+            parent_id_array = deque()
+
+            # comments disabled or no comment at all, a failed later page just ends the video
+            if responses is None or (not pt and not responses['items']):
+                if cursor is None and not pt:
+                    dict_comment_array.append(parsers.empty_comment(vid))
+                yield dict_comment_array, parent_id_array, None, new_cursor
+                return
+
             for item in responses['items']:
-                
-                if item['snippet']['totalReplyCount'] != 0:
-                    parent_id = item['id']
-                    parent_id_array.append(parent_id)
-                
+
                 snippet = item['snippet']['topLevelComment']['snippet']
-                key_has = set(snippet.keys())
-                empty_keys = key_require - key_has
-                
-                dict_comment = dict()
-                
-                # if there is any empty key
-                if empty_keys:
-                    for key in empty_keys:
-                        dict_comment[key] = None
-                        
-                key_remain = key_require - empty_keys
-                
-                
-                if key_remain:
+                total = item['snippet']['totalReplyCount']
 
-                    for key in key_remain:
-                    
-                        if key == 'authorChannelId':
-                            dict_comment[key] = snippet['authorChannelId']['value']
-                        
-                        else:
-                            dict_comment[key] = snippet[key]
-                
-                dict_comment['replyType'] = False
-                dict_comment['vid_id'] = vid
-                
-                
-                dict_comment_array.append(dict_comment)
-            
-            if 'nextPageToken' not in responses.keys():
-                
-                break
-            
-            else:
-                pt = responses['nextPageToken']
-            
-            
-        for parent_id in parent_id_array:
-                        
-            pt = ''
-            
-            while True:
+                if not pt and item is responses['items'][0]:
+                    new_cursor['newest'] = snippet['publishedAt']
+                    new_cursor['newest_id'] = item['id']
 
-                responses = self._response('comments', part='snippet', parentId=parent_id, 
-                                           maxResults=100, pageToken=pt, **kwargs)
-                
-                for item in responses['items']:
+                if cursor and (item['id'] == cursor['newest_id'] or snippet['publishedAt'] < cursor['newest']):
+                    reached = True
 
-                    snippet = item['snippet']
-                    
-                    key_has = set(snippet.keys())
-                    empty_keys = key_require - key_has
-                    
-                    dict_comment = dict()
+                if total:
+                    new_cursor['replies'][item['id']] = total
 
-                    # if there is any empty key
-                    if empty_keys:
-                        for key in empty_keys:
-                            dict_comment[key] = None
+                if not reached:
+                    dict_comment_array.append(parsers.comment(snippet, vid, reply=False))
 
-                    key_remain = key_require - empty_keys
+                # replies of an already seen thread did not change
+                elif known_replies.get(item['id'], 0) == total:
+                    continue
 
-                    if key_remain:
+                inline = item.get('replies', {}).get('comments', [])
 
-                        for key in key_remain:
+                # commentThreads returns at most 5 replies inline
+                if total > len(inline):
+                    parent_id_array.append(item['id'])
 
-                            if key == 'authorChannelId':
-                                dict_comment[key] = snippet['authorChannelId']['value']
+                else:
+                    dict_comment_array.extend(parsers.comment(reply['snippet'], vid, reply=True)
+                                              for reply in inline)
 
-                            else:
-                                dict_comment[key] = snippet[key]
+            pt = None if reached else responses.get('nextPageToken')
 
-                    dict_comment['replyType'] = True
-                    dict_comment['vid_id'] = vid
-                    
-                    dict_comment_array.append(dict_comment)
-                
-                if 'nextPageToken' not in responses.keys():
+            yield dict_comment_array, parent_id_array, pt, new_cursor
+
+            if not pt:
+                return
+
+    def _replies(self, vid, parent_id, **kwargs):
+        """Every reply of a comment thread
+        Args:
+             vid(str): Youtube video id
+             parent_id(str): comment thread id
+        Returns:
+            deque: Comment records
+        """
+        dict_comment_array = deque()
+
+        for comments, _ in self._reply_pages(vid, parent_id, **kwargs):
+            dict_comment_array.extend(comments)
 
-                    break
-                
-                else:
-                    pt = responses['nextPageToken']
-                    
         return dict_comment_array
-    
-    def comment(self, vids):
+
+    def _reply_pages(self, vid, parent_id, page_token='', **kwargs):
+        """comments pages of a comment thread, see _replies
+        Args:
+             page_token(str): page to start from when resuming a thread
+        Yields:
+            tuple: (deque of Comment records, token of the next page or None). paging stops early when a call fails
+        """
+        pt = page_token
+
+        while True:
+
+            responses = self._response('comments', part='snippet', parentId=parent_id,
+                                       maxResults=100, pageToken=pt, **kwargs)
+
+            if responses is None:
+                return
+
+            pt = responses.get('nextPageToken')
+
+            yield deque(parsers.comment(item['snippet'], vid, reply=True) for item in responses['items']), pt
+
+            if not pt:
+                return
+
+    def _comment(self, vid, **kwargs):
+        """Video comments by video id
+        Args:
+             vid(str): Youtube video id
+        Returns:
+            deque: Comment records
+        Examples:
+            >>>_comment(vid='DxfEdD7JpcE')
+                deque([Comment(published_at='2019-02-11T12:00:56.000', n_like=0, aut_id='UC963kbRm1ZOm68jDXkZSpDQ',
+                               aut_name='강성민', aut_img_url='https://yt3.ggpht.com/-ljpkNvLx6Ng/AAAAAAAAAAI/AAAAAAAAAAA/8dFlKZ5AGWM/s28-c-k-no-mo-rj-c0xffffff/photo.jpg',
+                               vid_comment='솔직히 말하면 쯔양님이 이긴거아니냐', reply=False, vid_id='DxfEdD7JpcE'),
+                        Comment(published_at='2019-02-11T02:03:16.000', n_like=1, aut_id='UCasr8l5uCtxH6zxspy-cg1Q',
+                               aut_name='뿌 뿌', aut_img_url='https://yt3.ggpht.com/-WxJvhks7ZMo/AAAAAAAAAAI/AAAAAAAAAAA/Hts2w2qzm4Q/s28-c-k-no-mo-rj-c0xffffff/photo.jpg',
+                               vid_comment='아니 걍 노답이다', reply=False, vid_id='DxfEdD7JpcE'), ...])
+        """
+        dict_comment_array, parent_id_array, _ = self._comment_threads(vid, **kwargs)
+
+        for parent_id in parent_id_array:
+            dict_comment_array.extend(self._replies(vid, parent_id, **kwargs))
+
+        return dict_comment_array
+
+    def comment(self, vids, cursors=None):
         """Video comments by video id(s)
-        video ids => split into list with 50 vids elements => Multiprocessing
+        every video and every reply thread is a task on the shared executor,
+        reply threads are queued as soon as their video's threads are read
         Args:
              vids(str): Youtube video id(s)
+             cursors(CommentCursorStore): per video crawl state. only new comments and changed reply
+                                          threads are crawled, new cursors are kept in the store until
+                                          its save() is called after writing
         Returns:
-            deque: dictionary array
+            deque: Comment records
         Examples:
             >>>comment(vid='___a64QBUoA,___BxqE6JNY')
-               deque([{'vid_id': '___a64QBUoA'},
-                      {'textDisplay': '1', 'publishedAt': '2017-06-14T06:21:40.000Z', 'authorDisplayName': 'Nabila Kastella', 'authorChannelId': 'UCgXL5lO-MLjGXOjZEQvEtoA',
-                       'likeCount': 1, 'authorProfileImageUrl': 'https://yt3.ggpht.com/-2ETp2uqZBtM/AAAAAAAAAAI/AAAAAAAAAAA/oYtuzdqPRC0/s28-c-k-no-mo-rj-c0xffffff/photo.jpg',
-                       'replyType': False, 'vid_id': '___BxqE6JNY'}])
+               deque([Comment(None, None, None, None, None, None, False, '___a64QBUoA'),
+                      Comment(published_at='2017-06-14T06:21:40.000', n_like=1, aut_id='UCgXL5lO-MLjGXOjZEQvEtoA',
+                              aut_name='Nabila Kastella', aut_img_url='https://yt3.ggpht.com/-2ETp2uqZBtM/AAAAAAAAAAI/AAAAAAAAAAA/oYtuzdqPRC0/s28-c-k-no-mo-rj-c0xffffff/photo.jpg',
+                              vid_comment='1', reply=False, vid_id='___BxqE6JNY')])
         """
-        vid_list = vids.split(',')
-        
-        vid_split_list = self._split_list(vid_list, self.processes)
-        
-        pool = Pool(self.processes)
-        
+        done = queue.Queue()
+        # future => video id, or (video id, parent id) for reply threads
+        pending = {}
+
+        def submit(task, fn, **kwargs):
+            future = self.executor.submit(fn, **kwargs)
+            pending[future] = task
+            future.add_done_callback(done.put)
+
+        for vid in vids.split(','):
+            submit(vid, self._comment_threads, vid=vid,
+                   cursor=cursors.get(vid) if cursors is not None else None)
+
         outputs = deque()
-        
-        for vid_split in vid_split_list:
-            
-            results = [pool.apply_async(self._comment, kwds={'vid': vid}) 
-                       for vid in vid_split]
-            
-            for p in results:
-                
-                outputs.extend(p.get())
-                
+
+        while pending:
+
+            future = done.get()
+            task = pending.pop(future)
+
+            if isinstance(task, tuple):
+                outputs.extend(future.result())
+                continue
+
+            dict_comment_array, parent_id_array, new_cursor = future.result()
+            outputs.extend(dict_comment_array)
+
+            if cursors is not None:
+                cursors.update(task, new_cursor)
+
+            for parent_id in parent_id_array:
+                submit((task, parent_id), self._replies, vid=task, parent_id=parent_id)
+
         return outputs
+
+    def _comment_job(self, vid, cursor=None, page_token='', new_cursor=None):
+        """iter_comment job, one page per commentThreads page.
+        the reply threads of a page are spawned as their own jobs after the page, so they arrive after it
+        """
+        for comments, parent_ids, next_page_token, new_cursor in self._comment_thread_pages(
+                vid, cursor=cursor, page_token=page_token, new_cursor=new_cursor):
+
+            yield {'vid_id': vid, 'comments': comments, 'next_page_token': next_page_token,
+                   'cursor': dict(new_cursor, replies=dict(new_cursor['replies'])), 'parent_ids': list(parent_ids)}
+
+            for parent_id in parent_ids:
+                yield Spawn(self._replies_job, {'vid': vid, 'parent_id': parent_id})
+
+    def _replies_job(self, vid, parent_id, page_token=''):
+        """iter_comment job, one page per comments page of a thread, an empty last page closes a failed thread"""
+        for comments, next_page_token in self._reply_pages(vid, parent_id, page_token=page_token):
+
+            yield {'vid_id': vid, 'comments': comments, 'parent_id': parent_id, 'next_page_token': next_page_token}
+
+            if next_page_token is None:
+                return
+
+        yield {'vid_id': vid, 'comments': deque(), 'parent_id': parent_id, 'next_page_token': None}
+
+    def iter_comment(self, vids, cursors=None, max_pages=None, page_tokens=None):
+        """streaming comment, commentThreads pages and reply threads are yielded as they arrive.
+        videos and reply threads all run concurrently on the shared executor
+        Args:
+             vids(str): Youtube video id(s)
+             cursors(CommentCursorStore): per video crawl state, read only here.
+                                          update it with the 'cursor' of the 'last' page after writing it
+             max_pages(int): pages waiting for the consumer
+             page_tokens(RunJournal): 'state' of the last written page per video of an interrupted crawl.
+                                      the video continues from that page and the next page of its
+                                      unfinished reply threads
+        Yields:
+            dict: {'vid_id': video id, 'comments': deque of Comment records,
+                   'state': {'token': next commentThreads page, None once every page is read,
+                             'cursor': new cursor so far,
+                             'replies': {parent id: next comments page} of the unfinished reply threads},
+                             journal it after writing the page,
+                   'cursor': new cursor so far, 'last': True on the video's last page}
+        """
+        jobs = deque()
+        states = {}
+
+        for vid in vids.split(','):
+
+            state = page_tokens.get(vid) if page_tokens is not None else None
+
+            if state is None:
+                state = {'token': '', 'cursor': None, 'replies': []}
+
+            replies = state.get('replies') or {}
+
+            # journals of older runs keep a list of unfinished threads
+            if not isinstance(replies, dict):
+                replies = dict.fromkeys(replies, '')
+
+            states[vid] = {'token': state['token'], 'cursor': state['cursor'], 'replies': replies}
+
+            if state['token'] is not None:
+                jobs.append((self._comment_job, {'vid': vid,
+                                                 'cursor': cursors.get(vid) if cursors is not None else None,
+                                                 'page_token': state['token'],
+                                                 'new_cursor': state['cursor']}))
+
+            for parent_id, token in states[vid]['replies'].items():
+                jobs.append((self._replies_job, {'vid': vid, 'parent_id': parent_id, 'page_token': token}))
+
+        for page in self._stream(jobs, max_pages=max_pages):
+
+            state = states[page['vid_id']]
+
+            if 'parent_id' in page:
+                if page['next_page_token'] is None:
+                    del state['replies'][page['parent_id']]
+                else:
+                    state['replies'][page['parent_id']] = page['next_page_token']
+
+            else:
+                state['token'] = page['next_page_token']
+                state['cursor'] = page['cursor']
+
+                for parent_id in page['parent_ids']:
+                    state['replies'].setdefault(parent_id, '')
+
+            last = state['token'] is None and not state['replies']
+
+            yield {'vid_id': page['vid_id'], 'comments': page['comments'],
+                   'state': {'token': state['token'], 'cursor': state['cursor'], 'replies': dict(state['replies'])},
+                   'cursor': state['cursor'], 'last': last}
+
+            if last:
+                del states[page['vid_id']]
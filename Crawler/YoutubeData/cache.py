@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import threading
+import time
+
+from utils.pickling import LockPickling
+
+
+class ResponseCache(LockPickling):
+    """
+    On-disk cache of list responses keyed by resource and normalized kwargs.
+    The stored etag is sent as If-None-Match, a 304 answer is served from the cache.
+    Entries older than ttl are dropped, the least recently used ones go first when max_bytes is exceeded.
+    Writes are committed every commit_every changes and on evict() and close(), a crash loses at most
+    those cache entries, never the crawled data
+    """
+
+    def __init__(self, path='.youtube_cache.sqlite', ttl=7 * 24 * 3600, max_bytes=512 * 1024 * 1024,
+                 evict_every=1000, commit_every=100):
+        """
+        Args:
+            path(str): sqlite file path
+            ttl(int): seconds an entry is kept
+            max_bytes(int): maximum total size of cached bodies
+            evict_every(int): run evict() after this many stored responses
+            commit_every(int): commit after this many stored, touched or used entries
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.commit_every = commit_every
+        self.n_set = 0
+        self.n_pending = 0
+        self.lock = threading.Lock()
+        self._conn = None
+
+    def __getstate__(self):
+        # a worker opens its own connection
+        state = super(ResponseCache, self).__getstate__()
+        state['_conn'] = None
+        return state
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # commits without an fsync each, the WAL is synced at checkpoints
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS response '
+                               '(key TEXT PRIMARY KEY, etag TEXT, body TEXT, size INTEGER, '
+                               'stored_at REAL, used_at REAL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS response_used_at ON response (used_at)')
+        return self._conn
+
+    def _changed(self):
+        # call with self.lock held, after a write
+        self.n_pending += 1
+
+        if self.n_pending >= self.commit_every:
+            self.conn.commit()
+            self.n_pending = 0
+
+    @staticmethod
+    def key(resource, kwargs):
+        """
+        Args:
+            resource(str): youtube client method resource
+            kwargs(dict): request kwargs without empty values
+        Returns:
+            str: cache key
+        """
+        return resource + '?' + json.dumps(kwargs, sort_keys=True, default=str)
+
+    def get(self, resource, kwargs):
+        """a hit updates used_at, evict() drops the least recently used entries
+        Returns:
+            tuple: (etag, response dict) or None
+        """
+        key = self.key(resource, kwargs)
+        now = time.time()
+
+        with self.lock:
+            row = self.conn.execute('SELECT etag, body, stored_at FROM response WHERE key = ?', (key,)).fetchone()
+
+            if row is None or row[2] < now - self.ttl:
+                return None
+
+            self.conn.execute('UPDATE response SET used_at = ? WHERE key = ?', (now, key))
+            self._changed()
+
+        return row[0], json.loads(row[1])
+
+    def touch(self, resource, kwargs):
+        """mark an entry as fresh after a 304"""
+        now = time.time()
+
+        with self.lock:
+            self.conn.execute('UPDATE response SET stored_at = ?, used_at = ? WHERE key = ?',
+                              (now, now, self.key(resource, kwargs)))
+            self._changed()
+
+    def set(self, resource, kwargs, response):
+        """
+        Args:
+            resource(str): youtube client method resource
+            kwargs(dict): request kwargs without empty values
+            response(dict): response with 'etag'
+        """
+        if not response or 'etag' not in response:
+            return
+
+        body = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+
+        with self.lock:
+            self.conn.execute('REPLACE INTO response (key, etag, body, size, stored_at, used_at) '
+                              'VALUES (?, ?, ?, ?, ?, ?)',
+                              (self.key(resource, kwargs), response['etag'], body, len(body), now, now))
+            self._changed()
+            self.n_set += 1
+            evict = self.n_set % self.evict_every == 0
+
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """drop expired entries, then least recently used ones until the size limit holds, commits pending writes"""
+        with self.lock, self.conn:
+            self.n_pending = 0
+            self.conn.execute('DELETE FROM response WHERE stored_at < ?', (time.time() - self.ttl,))
+
+            total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM response').fetchone()[0]
+
+            if total <= self.max_bytes:
+                return
+
+            rows = self.conn.execute('SELECT key, size FROM response ORDER BY used_at').fetchall()
+            drop = []
+
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                drop.append((key,))
+                total -= size
+
+            self.conn.executemany('DELETE FROM response WHERE key = ?', drop)
+
+    def close(self):
+        if self._conn is not None:
+            self.evict()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from utils.pickling import LockPickling
+from utils.store import JsonStore
+
+
+class CategoryStore(LockPickling):
+    """
+    videoCategories maps per region, kept for ttl seconds so hourly runs do not refetch them.
+    Persisted in a json file, or in memory only when path is None
+    """
+
+    def __init__(self, path='.video_categories.json', ttl=24 * 3600):
+        """
+        Args:
+            path(str): json file path, None for in-memory only
+            ttl(int): seconds a region's map is used before it is fetched again
+        """
+        self.store = JsonStore(path) if path else None
+        self.ttl = ttl
+        self.maps = self.store.load(default={}) if self.store else {}
+        self.lock = threading.Lock()
+
+    def get(self, rc):
+        """
+        Args:
+            rc(str): region code
+        Returns:
+            tuple: (cat_id_list, cat_id_tot_list), see parsers.video_categories. None when missing or expired
+        """
+        entry = self.maps.get(rc)
+
+        if entry is None or entry['fetched_at'] < time.time() - self.ttl:
+            return None
+
+        return entry['cat_id_list'], entry['cat_id_tot_list']
+
+    def set(self, rc, cat_id_list, cat_id_tot_list):
+        """
+        Args:
+            rc(str): region code
+            cat_id_list(dict): assignable category id => title, with '0': 'ALL'
+            cat_id_tot_list(dict): category id => title
+        """
+        with self.lock:
+            self.maps[rc] = {'fetched_at': time.time(), 'cat_id_list': cat_id_list,
+                             'cat_id_tot_list': cat_id_tot_list}
+
+            if self.store is not None:
+                self.store.save(self.maps)
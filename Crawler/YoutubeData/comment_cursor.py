@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+
+
+class CommentCursorStore(object):
+    """
+    Per video comment crawl state in a sqlite file:
+    the newest top level comment seen and the totalReplyCount of every thread with replies.
+    update() keeps new cursors in memory, save() persists them once the comments are written
+    """
+
+    def __init__(self, path='.comment_cursors.sqlite'):
+        """
+        Args:
+            path(str): sqlite file path
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = {}
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS cursor '
+                               '(vid_id TEXT PRIMARY KEY, newest TEXT, newest_id TEXT)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS reply_count '
+                               '(thread_id TEXT PRIMARY KEY, vid_id TEXT, total INTEGER)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS reply_count_vid_id ON reply_count (vid_id)')
+        return self._conn
+
+    def get(self, vid):
+        """
+        Args:
+            vid(str): Youtube video id
+        Returns:
+            dict: {'newest': publishedAt, 'newest_id': thread id, 'replies': {thread id: totalReplyCount}}
+                  or None for a video never crawled
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT newest, newest_id FROM cursor WHERE vid_id = ?', (vid,)).fetchone()
+
+            if row is None:
+                return None
+
+            replies = dict(self.conn.execute('SELECT thread_id, total FROM reply_count WHERE vid_id = ?', (vid,)))
+
+        return {'newest': row[0], 'newest_id': row[1], 'replies': replies}
+
+    def update(self, vid, cursor):
+        """keep a new cursor until save()
+        Args:
+            vid(str): Youtube video id
+            cursor(dict): cursor returned by YoutubeCrawler._comment_threads, None is ignored
+        """
+        if cursor and cursor['newest']:
+            with self.lock:
+                self.pending[vid] = cursor
+
+    def save(self):
+        """persist every pending cursor in one transaction"""
+        with self.lock, self.conn:
+            for vid, cursor in self.pending.items():
+                self.conn.execute('REPLACE INTO cursor (vid_id, newest, newest_id) VALUES (?, ?, ?)',
+                                  (vid, cursor['newest'], cursor['newest_id']))
+                self.conn.executemany('REPLACE INTO reply_count (thread_id, vid_id, total) VALUES (?, ?, ?)',
+                                      [(thread_id, vid, total) for thread_id, total in cursor['replies'].items()])
+            self.pending = {}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
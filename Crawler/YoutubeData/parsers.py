@@ -0,0 +1,207 @@
+"""
+Youtube Data API v3 response item parsers shared by YoutubeCrawler and AsyncYoutubeCrawler.
+Crawled entities are built directly as records, see records.py
+"""
+import json
+
+from YoutubeData.records import ChannelDesc, ChannelStats, VideoDesc, VideoTrend, VideoStats, Comment
+
+VIDEO_STATS_KEYS = ('viewCount', 'likeCount', 'dislikeCount', 'favoriteCount', 'commentCount')
+
+# 403 error reasons: the key's daily quota is spent, or too many requests for now.
+# every other 403 (forbidden, commentsDisabled, ...) fails the same way with every key
+QUOTA_REASONS = ('quotaExceeded', 'dailyLimitExceeded')
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+
+def _utc(published_at):
+    """'2019-01-01T00:00:00.000Z' => '2019-01-01T00:00:00.000', the DATETIME format of the tables"""
+    if published_at is not None and published_at.endswith('Z'):
+        return published_at[:-1]
+
+    return published_at
+
+
+def _count(value):
+    return int(value) if value is not None else None
+
+
+def channel_desc(item):
+    """
+    Args:
+        item(dict): channels item with snippet part
+    Returns:
+        ChannelDesc
+    """
+    snippet = item['snippet']
+    thumbnails = snippet['thumbnails']
+
+    return ChannelDesc(ch_title=snippet['title'],
+                       ch_id=item['id'],
+                       ch_desc=snippet['description'],
+                       ch_published_at=snippet['publishedAt'][:10],
+                       ch_thumb=','.join([thumbnails['default']['url'],
+                                          thumbnails['medium']['url'],
+                                          thumbnails['high']['url']]))
+
+
+def channel_countstats(item):
+    """
+    Args:
+        item(dict): channels item with statistics part
+    Returns:
+        ChannelStats
+    """
+    statistics_response = item['statistics']
+
+    view_count = int(statistics_response['viewCount'])
+    video_count = int(statistics_response['videoCount'])
+    comment_count = int(statistics_response['commentCount'])
+
+    if statistics_response['hiddenSubscriberCount'] is True:
+
+        subscriber_count = None
+        sub_view_ratio = None
+
+    else:
+
+        subscriber_count = int(statistics_response['subscriberCount'])
+
+        try:
+            sub_view_ratio = view_count / subscriber_count
+        except ZeroDivisionError:
+            sub_view_ratio = None
+
+    return ChannelStats(ch_id=item['id'], ch_n_sub=subscriber_count, ch_n_view=view_count,
+                        ch_n_video=video_count, ch_n_cmt=comment_count, sub_view_ratio=sub_view_ratio)
+
+
+def channel_uploads(item):
+    """
+    Args:
+        item(dict): channels item with contentDetails part
+    Returns:
+        dict
+    """
+    return {'ch_id': item['id'],
+            'uploads_id': item['contentDetails']['relatedPlaylists']['uploads']}
+
+
+def playlist_item(item):
+    """
+    Args:
+        item(dict): playlistItems item with snippet part
+    Returns:
+        VideoDesc
+    """
+    snippet = item['snippet']
+
+    return VideoDesc(ch_id=snippet['channelId'],
+                     upload_id=snippet['playlistId'],
+                     vid_id=snippet['resourceId']['videoId'],
+                     vid_title=snippet['title'],
+                     vid_desc=snippet['description'],
+                     vid_published_at=_utc(snippet['publishedAt']),
+                     vid_th=','.join([th['url'] for th in snippet['thumbnails'].values()]))
+
+
+def video_categories(response):
+    """
+    Args:
+        response(dict): videoCategories response
+    Returns:
+        tuple: ({assignable category id: title, '0': 'ALL'}, {category id: title})
+    """
+    cat_id_list = {item['id']: item['snippet']['title']
+                   for item in response['items'] if item['snippet']['assignable'] is True}
+
+    cat_id_tot_list = {item['id']: item['snippet']['title'] for item in response['items']}
+
+    cat_id_list['0'] = 'ALL'
+
+    return cat_id_list, cat_id_tot_list
+
+
+def video_trend(item, rc, cid, rank, cat_id_tot_list=None):
+    """
+    Args:
+        item(dict): videos item with snippet part
+        rc(str): region code
+        cid(int): youtube video category code of the chart
+        rank(int): rank in the chart
+        cat_id_tot_list(dict): category id => title for vid_cat, None leaves it empty
+    Returns:
+        VideoTrend
+    """
+    snippet = item['snippet']
+
+    if 'tags' in snippet.keys():
+        vid_tags = ','.join(snippet['tags'])
+
+    else:
+        vid_tags = ''
+
+    return VideoTrend(vid_id=item['id'], vid_published_at=_utc(snippet['publishedAt']),
+                      ch_id=snippet['channelId'], vid_title=snippet['title'],
+                      vid_desc=snippet['description'],
+                      vid_th=', '.join([th['url'] for th in snippet['thumbnails'].values()]),
+                      ch_title=snippet['channelTitle'], vid_tags=vid_tags,
+                      vid_cat_id=snippet['categoryId'], region_code=rc,
+                      vid_cat=cat_id_tot_list.get(snippet['categoryId']) if cat_id_tot_list else None,
+                      vid_rank=rank, vid_trend_cat=cid)
+
+
+def video_stats(item):
+    """
+    Args:
+        item(dict): videos item with statistics part
+    Returns:
+        VideoStats: missing counts are None
+    """
+    statistics = item['statistics']
+
+    return VideoStats(item['id'], *[_count(statistics.get(key)) for key in VIDEO_STATS_KEYS])
+
+
+def comment(snippet, vid, reply):
+    """
+    Args:
+        snippet(dict): comment snippet
+        vid(str): youtube video id
+        reply(bool): True if the comment is a reply
+    Returns:
+        Comment: missing keys are None
+    """
+    author = snippet.get('authorChannelId')
+
+    return Comment(published_at=_utc(snippet.get('publishedAt')),
+                   n_like=snippet.get('likeCount'),
+                   aut_id=author['value'] if author is not None else None,
+                   aut_name=snippet.get('authorDisplayName'),
+                   aut_img_url=snippet.get('authorProfileImageUrl'),
+                   vid_comment=snippet.get('textDisplay'),
+                   reply=reply,
+                   vid_id=vid)
+
+
+def empty_comment(vid):
+    """placeholder row for a video without comments
+    Args:
+        vid(str): youtube video id
+    Returns:
+        Comment
+    """
+    return Comment(None, None, None, None, None, None, False, vid)
+
+
+def error_reason(content):
+    """
+    Args:
+        content(bytes): error response body
+    Returns:
+        str: reason of the first error, e.g. 'quotaExceeded', None if the body is not an api error
+    """
+    try:
+        return json.loads(content)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+from multiprocessing.managers import BaseManager
+
+from dateutil import tz
+
+from utils.pickling import LockPickling
+from utils.store import JsonStore
+
+logger = logging.getLogger(__name__)
+
+# quota is reset at midnight Pacific Time
+PACIFIC = tz.gettz('America/Los_Angeles')
+
+# quota cost per resource, https://developers.google.com/youtube/v3/determine_quota_cost
+QUOTA_COST = {'search': 100}
+DEFAULT_COST = 1
+
+
+class QuotaExhausted(Exception):
+    """Every api key has spent its daily quota"""
+
+
+class KeyScheduler(LockPickling):
+    """
+    Quota aware api key scheduler.
+    Every call is charged to the least used key, usage is persisted per Pacific Time day.
+    The file is written at most every save_interval seconds, when a key is spent or the day changes, and on close()
+    """
+
+    def __init__(self, api_key_list, daily_limit=10000, path='.quota_usage.json', save_interval=10):
+        """
+        Args:
+            api_key_list (list): developer key list
+            daily_limit(int): quota units per key per day
+            path(str): json file path for persisting usage, None for in-memory only
+            save_interval(int): minimum seconds between two writes of the usage file
+        """
+        if not api_key_list:
+            raise ValueError('api_key_list is empty')
+
+        self.api_key_list = list(api_key_list)
+        self.daily_limit = daily_limit
+        self.store = JsonStore(path) if path else None
+        self.lock = threading.Lock()
+        self.save_interval = save_interval
+        self._saved_at = 0
+
+        self.day = None
+        self.usage = {}
+        self._load()
+
+    @staticmethod
+    def _today():
+        return datetime.now(PACIFIC).strftime('%Y-%m-%d')
+
+    @staticmethod
+    def _key_id(key):
+        # never write raw developer keys to disk
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+    @staticmethod
+    def cost(resource):
+        """
+        Args:
+            resource(str): youtube client method resource
+        Returns:
+            int: quota units of one list call
+        """
+        return QUOTA_COST.get(resource, DEFAULT_COST)
+
+    def _load(self):
+        self.day = self._today()
+        self.usage = {self._key_id(key): 0 for key in self.api_key_list}
+
+        if self.store is None:
+            return
+
+        saved = self.store.load(default={})
+
+        if saved.get('day') == self.day:
+            for key_id, units in saved.get('usage', {}).items():
+                if key_id in self.usage:
+                    self.usage[key_id] = units
+
+    def _save(self, force=True):
+        """
+        Args:
+            force(bool): False to skip the write when the last one is newer than save_interval
+        """
+        if self.store is None:
+            return
+
+        now = time.monotonic()
+
+        if not force and now - self._saved_at < self.save_interval:
+            return
+
+        self._saved_at = now
+        self.store.save({'day': self.day, 'usage': self.usage})
+
+    def _rollover(self):
+        if self._today() != self.day:
+            logger.info('quota day changed, usage reset')
+            self._load()
+            self._save()
+
+    def acquire(self, resource):
+        """charge one call of resource to the least used key
+        Args:
+            resource(str): youtube client method resource
+        Returns:
+            str: developer key
+        Raises:
+            QuotaExhausted: no key has enough quota left
+        """
+        cost = self.cost(resource)
+
+        with self.lock:
+            self._rollover()
+
+            candidates = [key for key in self.api_key_list
+                          if self.usage[self._key_id(key)] + cost <= self.daily_limit]
+
+            if not candidates:
+                self._save()
+                raise QuotaExhausted('all %d api keys exhausted for %s' % (len(self.api_key_list), self.day))
+
+            key = min(candidates, key=lambda k: self.usage[self._key_id(k)])
+            self.usage[self._key_id(key)] += cost
+
+            # written right away once the key is spent
+            self._save(force=self.usage[self._key_id(key)] >= self.daily_limit)
+
+        return key
+
+    def exhaust(self, key):
+        """mark key as spent, e.g. when the api answers 403 quotaExceeded
+        Args:
+            key(str): developer key
+        """
+        with self.lock:
+            self.usage[self._key_id(key)] = self.daily_limit
+            self._save()
+
+    def remaining(self):
+        """
+        Returns:
+            int: quota units left over all keys
+        """
+        with self.lock:
+            self._rollover()
+            return sum(self.daily_limit - units for units in self.usage.values())
+
+    def close(self):
+        """write the usage not saved yet"""
+        with self.lock:
+            self._save()
+
+
+class QuotaManager(BaseManager):
+    """
+    Serves one KeyScheduler from a manager process, so the worker processes of a process pool
+    charge the same usage and only that process writes the usage file
+
+    Examples:
+        >>> manager = QuotaManager()
+        >>> manager.start()
+        >>> scheduler = manager.KeyScheduler(api_key_list, path='.quota_usage.json')
+        >>> # pickled into workers as a proxy, then
+        >>> scheduler.close()
+        >>> manager.shutdown()
+    """
+
+
+QuotaManager.register('KeyScheduler', KeyScheduler, exposed=('acquire', 'exhaust', 'remaining', 'close'))
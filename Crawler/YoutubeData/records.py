@@ -0,0 +1,60 @@
+"""
+Compact record types for crawled entities.
+Records are namedtuples (no per instance __dict__), fields are in the column order of their table,
+so to_row() is a plain tuple for executemany / MySQL.bulk_insert
+"""
+from collections import namedtuple
+
+from utils.record import Record
+
+
+class ChannelDesc(Record, namedtuple('ChannelDesc', ['ch_title', 'ch_id', 'ch_desc', 'ch_published_at',
+                                                     'ch_thumb'])):
+    """t_ch_desc row, ch_thumb is the default, medium and high thumbnail urls joined by ','"""
+    __slots__ = ()
+    COLUMNS = ('ch_title', 'ch_id', 'ch_desc', 'ch_published_at', 'ch_thumb')
+
+
+class ChannelStats(Record, namedtuple('ChannelStats', ['ch_id', 'ch_n_sub', 'ch_n_view', 'ch_n_video',
+                                                       'ch_n_cmt', 'sub_view_ratio'])):
+    """t_ch_cstats row, ch_n_sub and sub_view_ratio are None for hidden subscriber counts"""
+    __slots__ = ()
+    COLUMNS = ('ch_id', 'ch_n_sub', 'ch_n_view', 'ch_n_video', 'ch_n_cmt')
+
+
+class VideoDesc(Record, namedtuple('VideoDesc', ['ch_id', 'upload_id', 'vid_id', 'vid_title', 'vid_desc',
+                                                 'vid_published_at', 'vid_th'])):
+    """t_ch_vid_desc row, vid_th is every thumbnail url joined by ','"""
+    __slots__ = ()
+    COLUMNS = ('ch_id', 'upload_id', 'vid_id', 'vid_title', 'vid_desc', 'vid_published_at', 'vid_th')
+
+
+class VideoTrend(Record, namedtuple('VideoTrend', ['vid_id', 'vid_published_at', 'ch_id', 'vid_title',
+                                                   'vid_desc', 'vid_th', 'ch_title', 'vid_tags',
+                                                   'vid_cat_id', 'region_code', 'vid_cat', 'vid_rank',
+                                                   'vid_trend_cat'])):
+    """t_vid_trend row, vid_th is every thumbnail url joined by ', '"""
+    __slots__ = ()
+    COLUMNS = ('vid_id', 'vid_published_at', 'ch_id', 'vid_title', 'vid_desc', 'vid_th', 'ch_title',
+               'vid_tags', 'vid_cat_id', 'region_code', 'vid_cat', 'vid_rank', 'vid_trend_cat')
+
+
+class VideoStats(Record, namedtuple('VideoStats', ['vid_id', 'view_count', 'like_count', 'dislike_count',
+                                                   'favorite_count', 'comment_count'])):
+    """video statistics, counts are int or None when hidden"""
+    __slots__ = ()
+    COLUMNS = ('vid_id', 'view_count', 'like_count', 'dislike_count', 'favorite_count', 'comment_count')
+
+
+class Comment(Record, namedtuple('Comment', ['published_at', 'n_like', 'aut_id', 'aut_name', 'aut_img_url',
+                                             'vid_comment', 'reply', 'vid_id'])):
+    """t_vid_comment row, every field but vid_id and reply is None for a video without comments"""
+    __slots__ = ()
+    COLUMNS = ('published_at', 'n_like', 'aut_id', 'aut_name', 'aut_img_url', 'vid_comment', 'reply', 'vid_id')
+
+
+class TrendRank(Record, namedtuple('TrendRank', ['region_code', 'vid_trend_cat', 'vid_id', 'vid_rank', 'prev_rank',
+                                                 'collected_at'])):
+    """t_vid_trend_rank row, a chart entry (prev_rank None), exit (vid_rank None) or rank change"""
+    __slots__ = ()
+    COLUMNS = ('region_code', 'vid_trend_cat', 'vid_id', 'vid_rank', 'prev_rank', 'collected_at')
@@ -0,0 +1,214 @@
+import sqlite3
+import threading
+import time
+
+from utils.iterables import chunks
+
+DAY = 24 * 3600
+
+# item columns added after the first schema, added to older files on open
+SIGNAL_COLUMNS = (('uploads_per_day', 'REAL'), ('trending', 'INTEGER'), ('published_at', 'REAL'),
+                  ('seen_at', 'REAL'))
+
+
+class RefreshScheduler(object):
+    """
+    Adaptive refresh times for channels and videos, state in a sqlite file.
+    An item's refresh interval shrinks with its activity: uploads per day, view velocity and
+    the age of a video. Trending items use min_interval, items without any activity max_interval.
+    track() streams the activity signals of the catalogue into the file, plan() selects the due items in sql,
+    most overdue first and as many as a quota budget allows. Memory does not grow with the catalogue
+
+    Examples:
+        >>> scheduler.track('channel', ((ch_id, {'uploads_per_day': 0.5, 'views': ch_n_view}) for ...), now)
+        >>> ch_ids = list(scheduler.plan('channel', budget=5000, seen=now))
+        >>> # crawl ch_ids, then
+        >>> scheduler.done('channel', ch_ids)
+    """
+
+    def __init__(self, path='.refresh_schedule.sqlite', min_interval=6 * 3600, base_interval=DAY,
+                 max_interval=7 * DAY, velocity_scale=10000, chunk_size=1000):
+        """
+        Args:
+            path(str): sqlite file path
+            min_interval(int): seconds between refreshes of the most active items
+            base_interval(int): seconds between refreshes at activity 1,
+                                one upload or velocity_scale views per day
+            max_interval(int): seconds between refreshes of inactive items
+            velocity_scale(int): views per day counted as activity 1
+            chunk_size(int): rows per executemany of track() and observe()
+        """
+        self.path = path
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.velocity_scale = velocity_scale
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # plan() reads on its own connection while done() and observe() write
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.create_function('refresh_interval', 5, self._sql_interval, deterministic=True)
+        return conn
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = self._connect()
+            self._conn.execute('CREATE TABLE IF NOT EXISTS item '
+                               '(kind TEXT, id TEXT, refreshed_at REAL, views INTEGER, views_at REAL, '
+                               'velocity REAL, PRIMARY KEY (kind, id))')
+
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(item)')}
+
+            for name, type_ in SIGNAL_COLUMNS:
+                if name not in columns:
+                    self._conn.execute('ALTER TABLE item ADD COLUMN %s %s' % (name, type_))
+
+            self._conn.execute('CREATE INDEX IF NOT EXISTS item_seen_at ON item (kind, seen_at)')
+            self._conn.commit()
+        return self._conn
+
+    def interval(self, velocity=0.0, uploads_per_day=0.0, trending=False, age_days=None):
+        """
+        Args:
+            velocity(float): views per day
+            uploads_per_day(float): recent uploads per day of a channel
+            trending(bool): True if the item is in a trend chart
+            age_days(float): days since a video was published, None for channels
+        Returns:
+            float: seconds between two refreshes
+        """
+        if trending:
+            return self.min_interval
+
+        activity = (uploads_per_day or 0.0) + max(velocity or 0.0, 0.0) / self.velocity_scale
+
+        if age_days is not None:
+            activity += 1.0 / max(age_days, 1.0)
+
+        # activity 0 => max_interval, activity 1 => base_interval
+        interval = self.max_interval / (1.0 + activity * (self.max_interval / self.base_interval - 1.0))
+
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _sql_interval(self, velocity, uploads_per_day, trending, published_at, now):
+        """interval() over item columns, registered as refresh_interval() on every connection"""
+        age_days = (now - published_at) / DAY if published_at is not None else None
+
+        return self.interval(velocity=velocity, uploads_per_day=uploads_per_day, trending=bool(trending),
+                             age_days=age_days)
+
+    def track(self, kind, items, now=None):
+        """store the activity signals of every item of a run, read one chunk at a time
+        Args:
+            kind(str): 'channel' or 'video'
+            items(iterable): (id, {'uploads_per_day': float, 'trending': bool, 'published_at': unix time,
+                             'views': int}) pairs, every key optional. views are passed to observe()
+            now(float): unix time, default time.time(). plan(seen=now) selects from these items only
+        Returns:
+            int: the number of items tracked
+        """
+        now = now or time.time()
+        n_items = 0
+
+        for chunk in chunks(items, self.chunk_size):
+
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    'INSERT INTO item (kind, id, uploads_per_day, trending, published_at, seen_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (kind, id) DO UPDATE SET uploads_per_day = excluded.uploads_per_day, '
+                    'trending = excluded.trending, published_at = excluded.published_at, seen_at = excluded.seen_at',
+                    [(kind, id, signals.get('uploads_per_day'), int(bool(signals.get('trending'))),
+                      signals.get('published_at'), now) for id, signals in chunk])
+
+            self.observe(kind, [(id, signals['views']) for id, signals in chunk if signals.get('views') is not None],
+                         now=now)
+            n_items += len(chunk)
+
+        return n_items
+
+    def observe(self, kind, views, now=None):
+        """record view counts, the velocity is updated when a count has changed since the last observation
+        Args:
+            kind(str): 'channel' or 'video'
+            views(dict): id => view count or an iterable of (id, view count) pairs, None counts are skipped
+            now(float): unix time, default time.time()
+        """
+        now = now or time.time()
+        views = views.items() if isinstance(views, dict) else views
+
+        # every right hand side reads the row before the update
+        query = ('INSERT INTO item (kind, id, views, views_at) VALUES (?, ?, ?, ?) '
+                 'ON CONFLICT (kind, id) DO UPDATE SET '
+                 'velocity = CASE WHEN item.views IS NOT NULL AND excluded.views != item.views '
+                 'AND excluded.views_at > item.views_at '
+                 'THEN (excluded.views - item.views) / ((excluded.views_at - item.views_at) / %d.0) '
+                 'ELSE item.velocity END, '
+                 'views_at = CASE WHEN item.views IS NULL OR excluded.views != item.views '
+                 'THEN excluded.views_at ELSE item.views_at END, '
+                 'views = excluded.views' % DAY)
+
+        for chunk in chunks(((kind, id, count, now) for id, count in views if count is not None),
+                                  self.chunk_size):
+
+            with self.lock, self.conn:
+                self.conn.executemany(query, chunk)
+
+    def plan(self, kind, budget=None, now=None, seen=None):
+        """due items selected and ordered in sql, read from the cursor
+        Args:
+            kind(str): 'channel' or 'video'
+            budget(int): maximum ids returned, None for every due id
+            now(float): unix time, default time.time()
+            seen(float): now of the track() call of this run, only its items are planned.
+                        None for every tracked item
+        Yields:
+            str: due ids, most overdue first. ids never refreshed come first
+        """
+        now = now or time.time()
+
+        # make sure the schema exists before the read connection is opened
+        self.conn
+
+        # overdue is the elapsed share of the item's interval, due from 1.0
+        query = ('SELECT id FROM (SELECT id, (? - refreshed_at) / '
+                 'refresh_interval(velocity, uploads_per_day, trending, published_at, ?) AS overdue '
+                 'FROM item WHERE kind = ? AND seen_at >= ?) '
+                 'WHERE overdue IS NULL OR overdue >= 1.0 '
+                 'ORDER BY overdue IS NOT NULL, overdue DESC LIMIT ?')
+
+        reader = self._connect()
+
+        try:
+            cursor = reader.execute(query, (now, now, kind, seen if seen is not None else float('-inf'),
+                                            max(budget, 0) if budget is not None else -1))
+
+            for row in cursor:
+                yield row[0]
+
+        finally:
+            reader.close()
+
+    def done(self, kind, ids, now=None):
+        """mark ids as refreshed, call after their data is written
+        Args:
+            kind(str): 'channel' or 'video'
+            ids(iterable): refreshed ids
+            now(float): unix time, default time.time()
+        """
+        now = now or time.time()
+
+        with self.lock, self.conn:
+            self.conn.executemany('INSERT INTO item (kind, id, refreshed_at) VALUES (?, ?, ?) '
+                                  'ON CONFLICT (kind, id) DO UPDATE SET refreshed_at = excluded.refreshed_at',
+                                  [(kind, id, now) for id in ids])
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,59 @@
+from collections import defaultdict
+
+from utils.snapshot import SnapshotStore
+from YoutubeData.records import TrendRank
+
+
+class TrendSnapshotStore(SnapshotStore):
+    """
+    Previous chart per (region, category), {vid_id: rank}, kept in memory and in a json file.
+    diff() compares a new chart with it, save() advances the snapshots once the diff is written
+    """
+
+    def __init__(self, path='.trend_snapshots.json'):
+        """
+        Args:
+            path(str): json file path
+        """
+        super(TrendSnapshotStore, self).__init__(path)
+
+    def vid_ids(self):
+        """
+        Returns:
+            set: video ids of every saved chart
+        """
+        return self.items()
+
+    @staticmethod
+    def key(rc, cid):
+        return '%s:%s' % (rc, cid)
+
+    def diff(self, videos, collected_at):
+        """compare every chart in videos with its snapshot, see SnapshotStore.compare
+        Args:
+            videos(list): VideoTrend records of one run
+            collected_at(datetime): timestamp of the run
+        Returns:
+            tuple: (VideoTrend records new to their chart, TrendRank records of entries, exits and rank changes)
+        """
+        charts = defaultdict(dict)
+        regions = {}
+        records = {}
+
+        for video in videos:
+            key = self.key(video.region_code, video.vid_trend_cat)
+            charts[key][video.vid_id] = video.vid_rank
+            regions[key] = (video.region_code, video.vid_trend_cat)
+            records[(key, video.vid_id)] = video
+
+        new_videos = []
+        changes = []
+
+        for key, vid_id, rank, prev_rank in self.compare(charts):
+
+            if prev_rank is None:
+                new_videos.append(records[(key, vid_id)])
+
+            changes.append(TrendRank(*regions[key], vid_id, rank, prev_rank, collected_at))
+
+        return new_videos, changes
@@ -0,0 +1,94 @@
+import sqlite3
+import threading
+
+from utils.store import JsonStore
+
+
+def cut(video_dict, watermark):
+    """cut an uploads playlist page (newest first) at the watermark
+    Args:
+        video_dict(list): VideoDesc records of one page
+        watermark(dict): {'vid_id': newest known video id, 'publishedAt': its published time}
+    Returns:
+        tuple: (videos newer than the watermark, True if the watermark was reached)
+    """
+    for i, video in enumerate(video_dict):
+
+        # published time check covers a deleted watermark video
+        if video.vid_id == watermark['vid_id'] or video.vid_published_at <= watermark['publishedAt']:
+            return video_dict[:i], True
+
+    return video_dict, False
+
+
+class WatermarkStore(object):
+    """
+    Newest video seen per channel (high-water mark), one row per channel in a sqlite file.
+    Update only after the videos are written, so a failed write is crawled again.
+    Every update is its own upsert, the cost of a run does not grow with the number of stored channels
+    """
+
+    def __init__(self, path='.watermarks.sqlite', legacy_path=None):
+        """
+        Args:
+            path(str): sqlite file path
+            legacy_path(str): json file of the marks of older versions, imported once into an empty file
+        """
+        self.path = path
+        self.legacy_path = legacy_path
+        self.lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS watermark '
+                               '(ch_id TEXT PRIMARY KEY, vid_id TEXT, published_at TEXT)')
+
+            if self.legacy_path and self._conn.execute('SELECT 1 FROM watermark LIMIT 1').fetchone() is None:
+                marks = JsonStore(self.legacy_path).load(default={})
+
+                with self._conn:
+                    self._conn.executemany('INSERT INTO watermark (ch_id, vid_id, published_at) VALUES (?, ?, ?)',
+                                           [(ch_id, mark['vid_id'], mark['publishedAt'])
+                                            for ch_id, mark in marks.items()])
+        return self._conn
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM watermark').fetchone()[0]
+
+    def get(self, ch_id):
+        """
+        Args:
+            ch_id(str): channel_id
+        Returns:
+            dict: {'vid_id': str, 'publishedAt': str} or None
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT vid_id, published_at FROM watermark WHERE ch_id = ?',
+                                    (ch_id,)).fetchone()
+
+        return {'vid_id': row[0], 'publishedAt': row[1]} if row else None
+
+    def update(self, ch_id, watermark):
+        """keep the newer of the stored and the given watermark, committed right away
+        Args:
+            ch_id(str): channel_id
+            watermark(dict): {'vid_id': str, 'publishedAt': str} or None
+        """
+        if not watermark:
+            return
+
+        with self.lock, self.conn:
+            self.conn.execute('INSERT INTO watermark (ch_id, vid_id, published_at) VALUES (?, ?, ?) '
+                              'ON CONFLICT (ch_id) DO UPDATE SET vid_id = excluded.vid_id, '
+                              'published_at = excluded.published_at '
+                              'WHERE excluded.published_at > watermark.published_at',
+                              (ch_id, watermark['vid_id'], watermark['publishedAt']))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,39 @@
+import os
+from datetime import datetime
+
+from utils.mysql import MySQL
+from MusicChart.chart import ChartCollector
+from MusicChart.chart_delta import ChartRank, ChartSnapshotStore
+
+
+def main():
+    """
+    Music Chart Crawler. Melon, Genie and Naver Music in one snapshot, compared with the previous one.
+    t_music_chart_rank gets chart entries, exits and rank changes only
+    """
+    snapshots = ChartSnapshotStore('.chart_snapshots.json')
+
+    conn = MySQL(host=os.environ['host'],
+                 db=os.environ['db'],
+                 user=os.environ['user'],
+                 port=os.environ['port'],
+                 passwd=os.environ['pw'],
+                 charset='utf8mb4',
+                 auto_commit=False)
+
+    collected_at = datetime.now().replace(microsecond=0)
+
+    with ChartCollector() as collector:
+        rows = collector.collect(collected_at)
+
+    changes = snapshots.diff(rows, collected_at)
+
+    conn.bulk_insert('t_music_chart_rank', ChartRank.COLUMNS, [change.to_row() for change in changes])
+    conn.close()
+
+    # the next run compares with this snapshot only once it is written
+    snapshots.save()
+
+if __name__ == '__main__':
+
+    main()
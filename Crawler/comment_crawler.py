@@ -1,74 +1,104 @@
+import argparse
+import logging
 import os
 
-import pandas as pd
+from utils.journal import RunJournal
+from utils.mysql import MySQLPool
+from YoutubeData.YoutubeCrawler import YoutubeCrawler, QuotaExhausted
+from YoutubeData.comment_cursor import CommentCursorStore
+from YoutubeData.records import Comment
 
-from utils.mysql import MySQL
-from YoutubeData.YoutubeCrawler import YoutubeCrawler
+logger = logging.getLogger(__name__)
 
-def comment_pre(comment):
+def vid_id_list(conn, day, window=True):
     """
-    preprocess comment for DB INSERT
+    latest n video id from each channel for crawling comment, selected in sql
+    Args:
+        conn(MySQL): connection
+        day(int): n videos per channel
+        window(bool): True for ROW_NUMBER() (MySQL 8+), False for one indexed
+                      (ch_id, vid_published_at) lookup per channel
+    Yields:
+        str: video id
     """
-    comment_list = list(comment)
-    
-    for comment_item in comment_list:
-    
-        if 'replyType' not in comment_item.keys():
-            comment_item['replyType'] = False
+    if window:
+        query = 'select vid_id from \
+                 (select vid_id, row_number() over (partition by ch_id order by vid_published_at desc) as rn \
+                  from t_ch_vid_desc) ranked \
+                 where rn <= %s'
 
-        if type(comment_item['publishedAt']) == str and comment_item['publishedAt'].endswith('Z'):
-            comment_item['publishedAt'] = comment_item['publishedAt'][:-1]
-    
-    return comment_list
+        for row in conn.select(query, (day,), stream=True, rows='tuple'):
+            yield row[0]
+
+        return
+
+    ch_id_list = [row[0] for row in conn.select('select distinct ch_id from t_ch_vid_desc', rows='tuple')]
+
+    for ch_id in ch_id_list:
+        for row in conn.select('select vid_id from t_ch_vid_desc where ch_id = %s \
+                                order by vid_published_at desc limit %s', (ch_id, day), rows='tuple'):
+            yield row[0]
     
-def vid_id_list(day):
+def main(resume=False):
     """
-    latest n video id from each channel for crawling comment
+    Args:
+        resume(bool): continue the last run if it stopped before the end
     """
-    ch_vid_gen = conn.select('select ch_id, vid_id, vid_published_at from t_ch_vid_desc')
-    ch_vid_list = list(ch_vid_gen)
-    df = pd.DataFrame(ch_vid_list)
-    df['rank'] = df.groupby('ch_id')['vid_published_at'].rank(ascending=False, method='first').values
-    df_10 = df[df['rank'] <= day]
-    vid_id_list = df_10['vid_id'].values
-    
-    return vid_id_list
-    
-def main():
-        
-    insert_vid_comment = 'INSERT IGNORE INTO YOUTUBE.t_vid_comment \
-                    (published_at, n_like, aut_id, aut_name, aut_img_url, vid_comment, reply, vid_id) \
-                    VALUES (%(publishedAt)s, %(likeCount)s, %(authorChannelId)s, %(authorDisplayName)s, \
-                    %(authorProfileImageUrl)s, %(textDisplay)s, %(replyType)s, %(vid_id)s)'
-    
     api_list = [os.environ['API_1'], os.environ['API_2'], os.environ['API_3'],
                 os.environ['API_4'], os.environ['API_5']]
     
-    conn = MySQL(host=os.environ['host'], 
-             db=os.environ['db'], 
-             user=os.environ['user'], 
-             port=os.environ['port'], 
-             passwd=os.environ['pw'],
-             charset='utf8mb4',
-             auto_commit=False)
-    
-    conn_02 = MySQL(host=os.environ['host'], 
-             db=os.environ['db'], 
-             user=os.environ['user'], 
-             port=os.environ['port'], 
-             passwd=os.environ['pw'],
-             charset='utf8mb4',
-             auto_commit=False)
-        
-    vid_id_list_return = vid_id_list(day=10)
-    vid_id_list_join = ','.join(vid_id_list_return)
-    yc = YoutubeCrawler(api_list, processes=50)
-    comment = yc.comment(vids=vid_id_list_join)
-    comment_list = comment_pre(comment)
-    conn_02.connect()
-    conn_02.executemany(insert_vid_comment, comment_list)
-    conn_02.conn.commit()
+    pool = MySQLPool(size=1,
+                     host=os.environ['host'], 
+                     db=os.environ['db'], 
+                     user=os.environ['user'], 
+                     port=os.environ['port'], 
+                     passwd=os.environ['pw'],
+                     charset='utf8mb4',
+                     auto_commit=False)
+
+    # written videos are skipped, videos in progress continue from their journaled page
+    journal = RunJournal('.run_journal.sqlite', 'comment_crawler')
+    journal.start(resume=resume)
+    completed = journal.completed()
+
+    with pool.connection() as conn:
+        vids = [vid for vid in vid_id_list(conn, day=10) if vid not in completed]
+
+    # only comments newer than the last crawl and reply threads whose count changed
+    cursors = CommentCursorStore('.comment_cursors.sqlite')
+
+    # comment pages are written as they arrive
+    with YoutubeCrawler(api_list, processes=50) as yc, pool.connection() as conn_02:
+
+        try:
+            for page in (yc.iter_comment(vids=','.join(vids), cursors=cursors, page_tokens=journal)
+                         if vids else []):
+
+                conn_02.bulk_insert('YOUTUBE.t_vid_comment', Comment.COLUMNS,
+                                    [c.to_row() for c in page['comments']], ignore=True)
+
+                # cursors advance only after the comments are written
+                if page['last']:
+                    cursors.update(page['vid_id'], page['cursor'])
+                    cursors.save()
+                    journal.done([page['vid_id']])
+
+                else:
+                    journal.set(page['vid_id'], page['state'])
+
+        except QuotaExhausted as e:
+            logger.error('%s, run again with --resume to continue after the last written page' % e)
+
+        else:
+            journal.finish()
+
+    cursors.close()
+    journal.close()
+    pool.close()
 
 if __name__ == '__main__':
-    
-    main()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resume', action='store_true', help='continue the last run if it stopped before the end')
+
+    main(resume=parser.parse_args().resume)
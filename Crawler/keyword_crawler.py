@@ -0,0 +1,44 @@
+import argparse
+import logging
+import os
+
+from utils.mysql import MySQL
+from SearchEngine.keyword import KeywordPoller, KeywordRank
+
+logger = logging.getLogger(__name__)
+
+
+def main(interval=60, polls=None):
+    """
+    Realtime keyword collector. Naver and Daum rankings every interval seconds,
+    t_keyword_rank gets entries, exits and rank changes, nothing when a ranking did not change
+    """
+    conn = MySQL(host=os.environ['host'],
+                 db=os.environ['db'],
+                 user=os.environ['user'],
+                 port=os.environ['port'],
+                 passwd=os.environ['pw'],
+                 charset='utf8mb4',
+                 auto_commit=False)
+
+    def write(changes):
+        conn.bulk_insert('t_keyword_rank', KeywordRank.COLUMNS, [change.to_row() for change in changes])
+
+    try:
+        with KeywordPoller(path='.keyword_snapshots.json') as poller:
+            poller.run(write, interval=interval, polls=polls)
+
+    except KeyboardInterrupt:
+        logger.info('stopped')
+
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interval', type=int, default=60, help='seconds between snapshots')
+    parser.add_argument('--polls', type=int, default=None, help='number of snapshots, run until stopped when omitted')
+    args = parser.parse_args()
+
+    main(interval=args.interval, polls=args.polls)
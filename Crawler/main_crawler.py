@@ -1,8 +1,23 @@
+import argparse
+import logging
 import os
+import time
 from datetime import datetime, timedelta
 
-from utils.mysql import MySQL
-from YoutubeData.YoutubeCrawler import YoutubeCrawler
+from utils.journal import RunJournal
+from utils.mysql import MySQLPool
+from utils.pipeline import Pipeline
+from YoutubeData.YoutubeCrawler import YoutubeCrawler, QuotaExhausted
+from YoutubeData.cache import ResponseCache
+from YoutubeData.records import ChannelDesc, ChannelStats, VideoDesc
+from YoutubeData.refresh import RefreshScheduler
+from YoutubeData.trend_delta import TrendSnapshotStore
+from YoutubeData.watermark import WatermarkStore
+
+logger = logging.getLogger(__name__)
+
+# estimated quota units per refreshed channel: its share of channels.list and the uploads playlist pages
+CHANNEL_COST = 2
 
 def gen_split(gen, n, key):
     
@@ -15,11 +30,15 @@ def gen_split(gen, n, key):
             new_list.append(value[key])
 
         except StopIteration:
-            return 
-    
+            break
+
+    # no longer id left
+    if not new_list:
+        return
+
     return ','.join(new_list)
     
-def update_check():
+def update_check(conn):
     
     created_at_gen = conn.select('select distinct created_at from t_ch_vid_desc;')
     created_at_gen_list = list(created_at_gen)
@@ -32,118 +51,248 @@ def update_check():
         update_day = dt_update.days
         return {'vid_update':True, 'update_day': update_day}
 
-def youtube_main_crawler(vid_update=True, update_day=2):
+def trending_ch_ids(conn, vids, n=1000):
+    """
+    Args:
+        conn(MySQL): connection
+        vids(iterable): video ids in a trend chart
+        n(int): ids per query
+    Returns:
+        set: channel ids of the videos
+    """
+    vids = list(vids)
+    ch_ids = set()
+
+    for i in range(0, len(vids), n):
+        chunk = vids[i:i + n]
+        query = 'select distinct ch_id from t_vid_trend where vid_id in (%s)' % ','.join(['%s'] * len(chunk))
+        ch_ids.update(row[0] for row in conn.select(query, tuple(chunk), rows='tuple'))
+
+    return ch_ids
+
+
+def channel_signals(conn, trending=(), days=30):
+    """refresh scheduler inputs of every channel in t_vid_trend, streamed from the server
+    Args:
+        conn(MySQL): connection used only by this query until the generator is exhausted
+        trending(set): channel ids with a video in a trend chart
+        days(int): window for the upload rate
+    Yields:
+        tuple: (ch_id, {'uploads_per_day': float, 'trending': bool, 'views': ch_n_view or None})
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    query = 'select t.ch_id, s.ch_n_view, coalesce(u.n_upload, 0) from (select distinct ch_id from t_vid_trend) t \
+             left join t_ch_cstats s on s.ch_id = t.ch_id \
+             left join (select ch_id, count(*) as n_upload from t_ch_vid_desc where vid_published_at >= %s \
+                        group by ch_id) u on u.ch_id = t.ch_id'
+
+    for ch_id, views, n_upload in conn.select(query, (since,), stream=True, rows='tuple'):
+        yield ch_id, {'uploads_per_day': n_upload / days, 'trending': ch_id in trending, 'views': views}
 
-    ch_id_gen = conn.select('select distinct ch_id from t_vid_trend')
 
+def id_batches(ch_id_gen, n=50):
+    """
+    Args:
+        ch_id_gen(generator): rows with ch_id
+        n(int): batch size
+    Yields:
+        str: comma joined channel ids, maximum n ids
+    """
     while True:
-        id_multi = gen_split(ch_id_gen, 50, 'ch_id')
+        id_multi = gen_split(ch_id_gen, n, 'ch_id')
 
         # break if no longer id left
         if id_multi is None:
-            break    
+            return
 
-        # t_ch_desc upsert
-        cds = yc.channel_desc(id=id_multi)
-        for cd in cds:
+        yield id_multi
 
-            th_de = cd['thumbnails']['default']['url']
-            th_med = cd['thumbnails']['medium']['url']
-            th_hi = cd['thumbnails']['high']['url']
-            ch_thumb = ','.join([th_de, th_med, th_hi])
 
-            ch_desc_dict = {'title': cd['title'], 'ch_id': cd['ch_id'], 
-                            'description': cd['description'], 'publishedAt': cd['publishedAt'],
-                            'ch_thumb': ch_thumb}
+def youtube_main_crawler(conn, conn_02, yc, vid_update=True, update_day=2, journal=None, queue_size=2,
+                         watermarks=None, ch_ids=None, scheduler=None):
+    """
+    id batching, api fetching and db writing run as concurrent pipeline stages,
+    so playlist pages are fetched while the pages before them are written
+    Args:
+        conn(MySQL): connection for reading channel ids
+        conn_02(MySQL): connection for writing
+        yc(YoutubeCrawler): youtube crawler
+        vid_update(bool): True if requesting video data created after update_day days ago
+        update_day(int): N days
+        journal(RunJournal): written channels and the playlist page reached by channels in progress.
+                             channels done in the journal are skipped, the run is finished on success
+        queue_size(int): fetched items waiting to be written
+        watermarks(WatermarkStore): newest written video per channel, advanced after its last page is written
+        ch_ids(list): channels to crawl in this order instead of every channel in t_vid_trend
+        scheduler(RefreshScheduler): channels are marked refreshed after each written batch
+    """
+    completed = journal.completed() if journal is not None else set()
 
-            conn_02.execute(upsert_cd, ch_desc_dict)
-            conn_02.conn.commit()
+    if completed:
+        logger.info('resuming, %d channels already written', len(completed))
 
-        # t_ch_cstats upsert
-        ccs = yc.channel_countstats(id=id_multi)
-        for cc in ccs:
-            conn_02.execute(upsert_cc, cc)
-            conn_02.conn.commit()
+    if ch_ids is not None:
+        ch_id_gen = iter([{'ch_id': ch_id} for ch_id in ch_ids if ch_id not in completed])
+
+    else:
+        ch_id_gen = (row for row in conn.select('select distinct ch_id from t_vid_trend order by ch_id')
+                     if row['ch_id'] not in completed)
+
+    def fetch(id_multi):
+        return fetch_batch(yc, id_multi, vid_update, update_day, watermarks, journal)
+
+    def write(item):
+        write_item(conn_02, item, watermarks, journal)
+
+        if item['kind'] != 'end':
+            return
+
+        if scheduler is not None:
+            scheduler.done('channel', item['id_multi'].split(','))
+
+        if journal is not None:
+            journal.done(item['id_multi'].split(','))
+
+    try:
+        Pipeline(id_batches(ch_id_gen), [fetch, write], maxsize=queue_size).run()
+
+    except QuotaExhausted as e:
+        logger.error('%s, run again with --resume to continue after the last written page' % e)
+        return
+
+    if journal is not None:
+        journal.finish()
+
+
+def fetch_batch(yc, id_multi, vid_update, update_day, watermarks=None, journal=None):
+    """crawl one batch of channel ids, a generator stage of the pipeline.
+    playlist pages go to the writer as they arrive, so the next pages are fetched while it writes
+    and memory is bounded by the pipeline queue, not by the size of the batch
+    Args:
+        yc(YoutubeCrawler): youtube crawler
+        id_multi(str): comma joined channel ids, maximum 50 ids
+        vid_update(bool): True if requesting video data created after update_day days ago
+        update_day(int): N days
+        watermarks(WatermarkStore): newest written video per channel
+        journal(RunJournal): channels in progress continue from their journaled playlist page
+    Yields:
+        dict: {'kind': 'channels', 'cds': channel_desc, 'ccs': channel_countstats} first,
+              {'kind': 'page', ...iter_channel_video_desc page} for every playlist page,
+              {'kind': 'end', 'id_multi': id_multi} once every page of the batch is fetched
+    """
+    # one channels.list call, channel_video_desc reuses it from the memo
+    info = yc.channel_info(id=id_multi)
+
+    yield {'kind': 'channels', 'cds': info['desc'], 'ccs': info['stats']}
+
+    if vid_update is True:
         
-        if vid_update is True:
-            
-            # t_ch_video_desc update
-            cvds = yc.channel_video_desc(id=id_multi, update=vid_update, days=update_day)
+        # t_ch_video_desc update
+        pages = yc.iter_channel_video_desc(id=id_multi, update=vid_update, days=update_day,
+                                           watermarks=watermarks, page_tokens=journal)
+    
+    else:
         
-        else:
-            
-            # t_ch_video_desc insert
-            cvds = yc.channel_video_desc(id=id_multi)
+        # t_ch_video_desc insert
+        pages = yc.iter_channel_video_desc(id=id_multi, page_tokens=journal)
+
+    for page in pages:
+        yield dict(page, kind='page')
+
+    yield {'kind': 'end', 'id_multi': id_multi}
 
-        for cvd in cvds:      
 
-            ch_vid_dict_list = []
+def write_item(conn_02, item, watermarks=None, journal=None):
+    """write one fetch_batch item and commit it
+    Args:
+        conn_02(MySQL): connection for writing
+        item(dict): fetch_batch item
+        watermarks(WatermarkStore): a channel's watermark is advanced after its last page is committed
+        journal(RunJournal): the next page token of a channel in progress is journaled after its page is committed,
+                             the channel is done after its last page
+    """
+    if item['kind'] == 'channels':
 
-            for vi in cvd['video_info_list']:
-                ch_id = cvd['ch_id']
-                upload_id = cvd['upload_id']
-                vid_id = vi['videoId']
-                vid_title = vi['title']
-                vid_desc = vi['description']
-                vid_published_at = vi['publishedAt'][:-1]
+        # t_ch_desc upsert
+        conn_02.bulk_insert('YOUTUBE.t_ch_desc', ChannelDesc.COLUMNS, [cd.to_row() for cd in item['cds']],
+                            update=['ch_title', 'ch_desc', 'ch_published_at', 'ch_thumb'], commit=False)
 
-                keys = vi['thumbnails'].keys()
-                vid_th = ','.join([vi['thumbnails'][key]['url'] for key in keys])
+        # t_ch_cstats upsert
+        conn_02.bulk_insert('YOUTUBE.t_ch_cstats', ChannelStats.COLUMNS, [cc.to_row() for cc in item['ccs']],
+                            update=['ch_n_sub', 'ch_n_view', 'ch_n_video', 'ch_n_cmt'], commit=False)
+        conn_02.commit()
 
+    elif item['kind'] == 'page':
 
-                ch_vid_desc_dict = {'ch_id': ch_id, 'upload_id': upload_id, 'vid_id': vid_id,
-                                    'vid_title': vid_title, 'vid_desc': vid_desc,
-                                    'vid_published_at': vid_published_at, 'vid_th': vid_th}
+        # t_ch_vid_desc insert, page by page as the uploads playlists are crawled
+        conn_02.bulk_insert('YOUTUBE.t_ch_vid_desc', VideoDesc.COLUMNS,
+                            [vi.to_row() for vi in item['video_info_list']], ignore=True, commit=False)
+        conn_02.commit()
 
-                ch_vid_dict_list.append(ch_vid_desc_dict)
+        if item['last']:
+            if watermarks is not None:
+                watermarks.update(item['ch_id'], item['watermark'])
 
-            # insert all video by a channel
-            conn_02.connect()
-            conn_02.executemany(insert_vid_desc, ch_vid_dict_list)
-            conn_02.conn.commit()
-            
-def main():
+            # a resumed run skips the channel
+            if journal is not None:
+                journal.done([item['ch_id']])
+
+        elif journal is not None:
+            journal.set(item['ch_id'], {'token': item['next_page_token'], 'watermark': item['watermark']})
+
+
+def main(resume=False):
     """
     Youtube Main Crawler. Expected to run once a day
+    Args:
+        resume(bool): continue the last run if it stopped before the end
     """    
     api_list = [os.environ['API_1'], os.environ['API_2'], os.environ['API_3'],
                 os.environ['API_4'], os.environ['API_5']]
     
-    yc = YoutubeCrawler(api_list, processes=50)
+    yc = YoutubeCrawler(api_list, processes=50, cache=ResponseCache('.youtube_cache.sqlite'))
     
-    conn = MySQL(host=os.environ['host'], 
-             db=os.environ['db'], 
-             user=os.environ['user'], 
-             port=os.environ['port'], 
-             passwd=os.environ['pw'],
-             charset='utf8mb4',
-             auto_commit=False)
+    pool = MySQLPool(size=2,
+                     host=os.environ['host'], 
+                     db=os.environ['db'], 
+                     user=os.environ['user'], 
+                     port=os.environ['port'], 
+                     passwd=os.environ['pw'],
+                     charset='utf8mb4',
+                     auto_commit=False)
     
-    conn_02 = MySQL(host=os.environ['host'], 
-             db=os.environ['db'], 
-             user=os.environ['user'], 
-             port=os.environ['port'], 
-             passwd=os.environ['pw'],
-             charset='utf8mb4',
-             auto_commit=False)
-    
-    upsert_cd = 'INSERT INTO YOUTUBE.t_ch_desc \
-          (ch_title, ch_id, ch_desc, ch_published_at, ch_thumb) \
-          VALUES (%(title)s, %(ch_id)s, %(description)s, %(publishedAt)s, %(ch_thumb)s) \
-          ON DUPLICATE KEY UPDATE ch_title=%(title)s, ch_desc=%(description)s, ch_published_at=%(publishedAt)s, ch_thumb=%(ch_thumb)s'
-
-    upsert_cc = 'INSERT INTO YOUTUBE.t_ch_cstats \
-              (ch_id, ch_n_sub, ch_n_view, ch_n_video, ch_n_cmt) \
-              VALUES (%(ch_id)s, %(subscriberCount)s, %(viewCount)s, %(videoCount)s, %(comment_count)s) \
-              ON DUPLICATE KEY UPDATE ch_n_sub=%(subscriberCount)s, ch_n_view=%(viewCount)s, ch_n_video=%(videoCount)s, ch_n_cmt=%(comment_count)s'
-
-    insert_vid_desc = 'INSERT IGNORE INTO YOUTUBE.t_ch_vid_desc \
-                       (ch_id, upload_id, vid_id, vid_title, vid_desc, vid_published_at, vid_th) \
-                       VALUES (%(ch_id)s, %(upload_id)s, %(vid_id)s, %(vid_title)s, %(vid_desc)s, %(vid_published_at)s, %(vid_th)s) \
-                       '
-    check = update_check()
-    youtube_main_crawler(**check)    
+    journal = RunJournal('.run_journal.sqlite', 'main_crawler')
+    resumed = journal.start(resume=resume)
+    watermarks = WatermarkStore('.watermarks.sqlite', legacy_path='.watermarks.json')
+    scheduler = RefreshScheduler('.refresh_schedule.sqlite')
+
+    # conn reads channel ids, conn_02 is used by the write stage
+    with yc, pool.connection() as conn, pool.connection() as conn_02:
+        # a resumed run keeps the update window of the stopped run
+        check = journal.get('__update_check__') if resumed else None
+
+        if check is None:
+            check = update_check(conn)
+            journal.set('__update_check__', check)
+
+        # the most due channels first, as many as the remaining quota allows
+        now = time.time()
+        trending = trending_ch_ids(conn, TrendSnapshotStore('.trend_snapshots.json').vid_ids())
+        n_items = scheduler.track('channel', channel_signals(conn, trending), now=now)
+        ch_ids = list(scheduler.plan('channel', budget=yc.scheduler.remaining() // CHANNEL_COST, now=now, seen=now))
+        logger.info('%d of %d channels due' % (len(ch_ids), n_items))
+
+        youtube_main_crawler(conn, conn_02, yc, journal=journal, watermarks=watermarks,
+                             ch_ids=ch_ids, scheduler=scheduler, **check)
+
+    journal.close()
+    watermarks.close()
+    scheduler.close()
+    pool.close()
 
 if __name__ == '__main__':
-    
-    main()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resume', action='store_true', help='continue the last run if it stopped before the end')
+
+    main(resume=parser.parse_args().resume)
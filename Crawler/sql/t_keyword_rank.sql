@@ -0,0 +1,14 @@
+-- keyword_crawler.py, realtime keyword entries, exits and rank changes per (source, category) ranking.
+-- kw_rank is NULL for a keyword leaving the ranking, prev_rank NULL for one entering it
+CREATE TABLE IF NOT EXISTS t_keyword_rank (
+    id           BIGINT UNSIGNED  NOT NULL AUTO_INCREMENT,
+    source       VARCHAR(16)      NOT NULL,
+    category     VARCHAR(64)      NOT NULL,
+    keyword      VARCHAR(255)     NOT NULL,
+    kw_rank      SMALLINT UNSIGNED NULL,
+    prev_rank    SMALLINT UNSIGNED NULL,
+    collected_at DATETIME         NOT NULL,
+    PRIMARY KEY (id),
+    KEY t_keyword_rank_ranking (source, category, collected_at),
+    KEY t_keyword_rank_keyword (keyword(64), collected_at)
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
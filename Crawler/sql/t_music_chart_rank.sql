@@ -0,0 +1,14 @@
+-- chart_crawler.py, music chart entries, exits and rank changes per provider.
+-- chart_rank is NULL for a song leaving the chart, prev_rank NULL for one entering it
+CREATE TABLE IF NOT EXISTS t_music_chart_rank (
+    id           BIGINT UNSIGNED  NOT NULL AUTO_INCREMENT,
+    provider     VARCHAR(16)      NOT NULL,
+    song         VARCHAR(255)     NOT NULL,
+    artist       VARCHAR(255)     NOT NULL,
+    chart_rank   SMALLINT UNSIGNED NULL,
+    prev_rank    SMALLINT UNSIGNED NULL,
+    collected_at DATETIME         NOT NULL,
+    PRIMARY KEY (id),
+    KEY t_music_chart_rank_provider (provider, collected_at),
+    KEY t_music_chart_rank_song (song(64), artist(64))
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
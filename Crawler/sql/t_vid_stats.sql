@@ -0,0 +1,23 @@
+-- stats_crawler.py, one row per video per run, append only.
+-- monthly partitions on collected_at: old months are dropped with DROP PARTITION instead of DELETE,
+-- add next month before it starts:
+--   ALTER TABLE YOUTUBE.t_vid_stats REORGANIZE PARTITION pmax INTO
+--       (PARTITION p202702 VALUES LESS THAN ('2027-03-01'), PARTITION pmax VALUES LESS THAN (MAXVALUE));
+CREATE TABLE IF NOT EXISTS YOUTUBE.t_vid_stats (
+    vid_id         VARCHAR(16)     NOT NULL,
+    view_count     BIGINT UNSIGNED NULL,
+    like_count     BIGINT UNSIGNED NULL,
+    dislike_count  BIGINT UNSIGNED NULL,
+    favorite_count BIGINT UNSIGNED NULL,
+    comment_count  BIGINT UNSIGNED NULL,
+    collected_at   DATETIME        NOT NULL,
+    PRIMARY KEY (vid_id, collected_at),
+    KEY t_vid_stats_collected_at (collected_at)
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4
+PARTITION BY RANGE COLUMNS (collected_at) (
+    PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+    PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p202701 VALUES LESS THAN ('2027-02-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
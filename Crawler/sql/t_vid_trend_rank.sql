@@ -0,0 +1,14 @@
+-- trend_crwaler.py, trend chart entries, exits and rank changes per (region, category) chart.
+-- vid_rank is NULL for a video leaving the chart, prev_rank NULL for one entering it
+CREATE TABLE IF NOT EXISTS YOUTUBE.t_vid_trend_rank (
+    id            BIGINT UNSIGNED  NOT NULL AUTO_INCREMENT,
+    region_code   CHAR(2)          NOT NULL,
+    vid_trend_cat VARCHAR(8)       NOT NULL,
+    vid_id        VARCHAR(16)      NOT NULL,
+    vid_rank      SMALLINT UNSIGNED NULL,
+    prev_rank     SMALLINT UNSIGNED NULL,
+    collected_at  DATETIME         NOT NULL,
+    PRIMARY KEY (id),
+    KEY t_vid_trend_rank_chart (region_code, vid_trend_cat, collected_at),
+    KEY t_vid_trend_rank_vid_id (vid_id, collected_at)
+) ENGINE = InnoDB DEFAULT CHARSET = utf8mb4;
@@ -0,0 +1,121 @@
+import logging
+import os
+from datetime import datetime, timezone
+
+from dateutil.parser import parse
+
+from utils.mysql import MySQLPool
+from YoutubeData.YoutubeCrawler import YoutubeCrawler, QuotaExhausted
+from YoutubeData.records import VideoStats
+from YoutubeData.refresh import RefreshScheduler
+from YoutubeData.trend_delta import TrendSnapshotStore
+
+logger = logging.getLogger(__name__)
+
+# t_vid_stats is append only, one narrow row per video per run, partitioned by collected_at (sql/t_vid_stats.sql)
+vid_stats_columns = VideoStats.COLUMNS + ('collected_at',)
+
+
+def video_signals(conn, trending=()):
+    """refresh scheduler inputs of every video in t_ch_vid_desc and t_vid_trend, streamed from the server
+    Args:
+        conn(MySQL): connection used only by this query until the generator is exhausted
+        trending(set): video ids in a trend chart
+    Yields:
+        tuple: (vid_id, {'published_at': unix time or None, 'trending': bool})
+    """
+    query = 'select vid_id, vid_published_at from t_ch_vid_desc \
+             union select vid_id, vid_published_at from t_vid_trend'
+
+    for vid_id, published_at in conn.select(query, stream=True, rows='tuple'):
+
+        if isinstance(published_at, str):
+            published_at = parse(published_at)
+
+        # vid_published_at is utc
+        published_at = published_at.replace(tzinfo=timezone.utc).timestamp() if published_at else None
+
+        yield vid_id, {'published_at': published_at, 'trending': vid_id in trending}
+
+
+def collect_stats(conn, yc, vids, collected_at, flush_rows=5000, scheduler=None):
+    """
+    videos.list part=statistics for 50 ids per call, pages are written in bulk as they arrive
+    Args:
+        conn(MySQL): connection for writing
+        yc(YoutubeCrawler): youtube crawler
+        vids(iterable): video ids, read 50 at a time as the calls are made
+        collected_at(datetime): timestamp of every row of the run
+        flush_rows(int): rows buffered before a bulk insert
+        scheduler(RefreshScheduler): view counts are observed and videos marked refreshed after each insert
+    Returns:
+        int: the number of rows written
+    """
+    records = []
+    n_rows = 0
+
+    def flush():
+        n = conn.bulk_insert('YOUTUBE.t_vid_stats', vid_stats_columns,
+                             [stats.to_row() + (collected_at,) for stats in records])
+
+        if scheduler is not None:
+            scheduler.observe('video', {stats.vid_id: stats.view_count for stats in records})
+            scheduler.done('video', [stats.vid_id for stats in records])
+
+        return n
+
+    try:
+        for page in yc.iter_video_stats(vids):
+
+            records.extend(page)
+
+            if len(records) >= flush_rows:
+                n_rows += flush()
+                records = []
+
+    except QuotaExhausted as e:
+        logger.error('%s, stats of the remaining videos are skipped' % e)
+
+    if records:
+        n_rows += flush()
+
+    return n_rows
+
+
+def main():
+    """
+    Video Statistics Crawler. Expected to run once a day
+    """
+    api_list = [os.environ['API_1'], os.environ['API_2'], os.environ['API_3'],
+                os.environ['API_4'], os.environ['API_5']]
+
+    pool = MySQLPool(size=2,
+                     host=os.environ['host'],
+                     db=os.environ['db'],
+                     user=os.environ['user'],
+                     port=os.environ['port'],
+                     passwd=os.environ['pw'],
+                     charset='utf8mb4',
+                     auto_commit=False)
+
+    collected_at = datetime.utcnow().replace(microsecond=0)
+    now = collected_at.replace(tzinfo=timezone.utc).timestamp()
+    scheduler = RefreshScheduler('.refresh_schedule.sqlite')
+
+    # conn streams video ids into the schedule, conn_02 writes the stats
+    with YoutubeCrawler(api_list, processes=50) as yc, pool.connection() as conn, pool.connection() as conn_02:
+        n_items = scheduler.track('video', video_signals(conn, TrendSnapshotStore('.trend_snapshots.json').vid_ids()),
+                                  now=now)
+
+        # the most due videos first, 50 ids per quota unit, read from the schedule as the calls are made
+        vids = scheduler.plan('video', budget=yc.scheduler.remaining() * 50, now=now, seen=now)
+        n_rows = collect_stats(conn_02, yc, vids, collected_at, scheduler=scheduler)
+
+    logger.info('%d of %d video stats written' % (n_rows, n_items))
+
+    scheduler.close()
+    pool.close()
+
+if __name__ == '__main__':
+
+    main()
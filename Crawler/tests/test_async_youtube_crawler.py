@@ -0,0 +1,131 @@
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from YoutubeData.AsyncYoutubeCrawler import AsyncYoutubeCrawler
+
+
+def playlist_item(vid_id, published_at):
+    return {'snippet': {'channelId': 'UC1', 'playlistId': 'UU1', 'resourceId': {'videoId': vid_id},
+                        'title': vid_id, 'description': '', 'publishedAt': published_at,
+                        'thumbnails': {'default': {'url': 'https://i.ytimg.com/%s.jpg' % vid_id}}}}
+
+
+class FakeYoutube(object):
+    """Youtube Data API v3 stand-in, records the key of every request"""
+
+    # playlistItems pages by page token
+    PAGES = {
+        '': {'items': [playlist_item('v1', '2019-02-11T12:00:00Z'), playlist_item('v2', '2019-02-10T12:00:00Z')],
+             'nextPageToken': 'p2'},
+        'p2': {'items': [playlist_item('v3', '2019-02-09T12:00:00Z')]},
+    }
+
+    def __init__(self):
+        self.keys = []
+        self.app = web.Application()
+        self.app.router.add_get('/channels', self.channels)
+        self.app.router.add_get('/playlistItems', self.playlist_items)
+        self.app.router.add_get('/videos', self.videos)
+        self.app.router.add_get('/commentThreads', self.comment_threads)
+
+    async def channels(self, request):
+        self.keys.append(request.query['key'])
+
+        if request.query['id'] == 'gone':
+            return web.Response(status=404, body=b'channelNotFound')
+
+        return web.json_response({'items': [{'id': 'UC1', 'contentDetails': {'relatedPlaylists': {'uploads': 'UU1'}}}]})
+
+    async def playlist_items(self, request):
+        self.keys.append(request.query['key'])
+
+        return web.json_response(self.PAGES[request.query.get('pageToken', '')])
+
+    async def videos(self, request):
+        self.keys.append(request.query['key'])
+
+        if request.query['key'] == 'spent':
+            return web.Response(status=403, body=b'{"error": {"errors": [{"reason": "quotaExceeded"}]}}')
+
+        if request.query['id'] == 'private':
+            return web.Response(status=403, body=b'{"error": {"errors": [{"reason": "forbidden"}]}}')
+
+        # rate limited once, the message mentions quota
+        if request.query['id'] == 'busy' and self.keys.count(request.query['key']) == 1:
+            return web.Response(status=403, body=b'{"error": {"errors": [{"reason": "rateLimitExceeded", '
+                                                  b'"message": "per minute quota"}]}}')
+
+        return web.json_response({'items': [{'id': 'v1', 'statistics': {'viewCount': '10', 'likeCount': '2'}}]})
+
+    async def comment_threads(self, request):
+        self.keys.append(request.query['key'])
+
+        # the second page fails
+        if request.query.get('pageToken'):
+            return web.Response(status=403, body=b'{"error": {"errors": [{"reason": "forbidden"}]}}')
+
+        thread = {'id': 't1', 'snippet': {'totalReplyCount': 0, 'topLevelComment': {'snippet': {
+            'publishedAt': '2019-02-11T12:00:00Z', 'textDisplay': 'first'}}}}
+
+        return web.json_response({'items': [thread], 'nextPageToken': 'c2'})
+
+
+class AsyncYoutubeCrawlerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.fake = FakeYoutube()
+        self.server = TestServer(self.fake.app)
+        await self.server.start_server()
+
+        self.yc = AsyncYoutubeCrawler(['spent', 'good'], quota_path=None, retry_delay=0,
+                                      base_url=str(self.server.make_url('/')))
+
+    async def asyncTearDown(self):
+        await self.yc.close()
+        await self.server.close()
+
+    async def test_paging(self):
+        cvds = await self.yc.channel_video_desc(id='UC1')
+
+        self.assertEqual(len(cvds), 1)
+        self.assertEqual([v.vid_id for v in cvds[0]['video_info_list']], ['v1', 'v2', 'v3'])
+        self.assertEqual(cvds[0]['watermark'], {'vid_id': 'v1', 'publishedAt': '2019-02-11T12:00:00'})
+
+    async def test_quota_key_rotation(self):
+        stats = await self.yc.video_stats('v1')
+
+        self.assertEqual([(s.vid_id, s.view_count) for s in stats], [('v1', 10)])
+        self.assertEqual(self.fake.keys, ['spent', 'good'])
+        # the spent key is not used again
+        self.assertEqual(self.yc.scheduler.usage[self.yc.scheduler._key_id('spent')], self.yc.scheduler.daily_limit)
+
+    async def test_forbidden(self):
+        self.assertIsNone(await self.yc._response('videos', part='statistics', id='private'))
+        # not retried, the good key is not spent
+        self.assertEqual(self.fake.keys, ['spent', 'good'])
+        self.assertLess(self.yc.scheduler.usage[self.yc.scheduler._key_id('good')], self.yc.scheduler.daily_limit)
+
+    async def test_rate_limit(self):
+        stats = await self.yc.video_stats('busy')
+
+        self.assertEqual([s.vid_id for s in stats], ['v1'])
+        # retried with the same key, a rate limit does not spend it
+        self.assertEqual(self.fake.keys, ['spent', 'good', 'good'])
+        self.assertLess(self.yc.scheduler.usage[self.yc.scheduler._key_id('good')], self.yc.scheduler.daily_limit)
+
+    async def test_comment_failed_page(self):
+        comments = await self.yc._comment('v1')
+
+        # the first page is kept, no placeholder for a video with comments
+        self.assertEqual([c.vid_comment for c in comments], ['first'])
+
+    async def test_not_found(self):
+        self.assertIsNone(await self.yc._response('channels', part='snippet', id='gone'))
+        self.assertEqual(await self.yc.channel_desc(id='gone'), [])
+        self.assertEqual(len(self.fake.keys), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import main_crawler
+    from YoutubeData.YoutubeCrawler import YoutubeCrawler, QuotaExhausted
+    from YoutubeData.watermark import WatermarkStore
+    from utils.journal import RunJournal
+except ImportError:  # googleapiclient and pymysql
+    main_crawler = None
+
+CHANNELS = ['c0', 'c1', 'c2', 'c3']
+
+VIDEOS = ['v0', 'v1', 'v2']
+
+
+def channel_item(ch_id):
+    thumb = {'url': 'https://yt3.ggpht.com/%s.jpg' % ch_id}
+
+    return {'id': ch_id,
+            'snippet': {'title': ch_id, 'description': '', 'publishedAt': '2019-01-01T00:00:00Z',
+                        'thumbnails': {'default': thumb, 'medium': thumb, 'high': thumb}},
+            'statistics': {'viewCount': '1', 'videoCount': '6', 'commentCount': '0', 'hiddenSubscriberCount': True},
+            'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + ch_id}}}
+
+
+def playlist_item(ch_id, i):
+    # newest first
+    return {'snippet': {'channelId': ch_id, 'playlistId': 'UU' + ch_id,
+                        'resourceId': {'videoId': '%s-v%d' % (ch_id, i)},
+                        'title': 't', 'description': '', 'publishedAt': '2019-02-11T12:00:%02dZ' % (59 - i),
+                        'thumbnails': {'default': {'url': 'https://i.ytimg.com/%s-v%d.jpg' % (ch_id, i)}}}}
+
+
+def thread_item(vid, i, total):
+    snippet = {'publishedAt': '2019-02-11T12:%02d:00Z' % (59 - i), 'textDisplay': '%s-c%d' % (vid, i)}
+
+    return {'id': '%s-t%d' % (vid, i), 'snippet': {'topLevelComment': {'snippet': snippet}, 'totalReplyCount': total}}
+
+
+class FakeYoutube(object):
+    """
+    YoutubeCrawler._response stand-in, records every page it returns and raises QuotaExhausted after quota_after pages.
+    every uploads playlist has 3 pages of 2 videos, every video 3 commentThreads pages of 2 threads,
+    the first thread of a page has 7 replies in 3 comments pages
+    """
+
+    def __init__(self, quota_after=None):
+        self.quota_after = quota_after
+        self.calls = []
+
+    def __call__(self, resource, **kwargs):
+        if self.quota_after is not None and len(self.calls) >= self.quota_after:
+            raise QuotaExhausted('every api key has spent its daily quota')
+
+        pt = kwargs.get('pageToken') or ''
+        page = int(pt or 0)
+
+        if resource == 'channels':
+            self.calls.append((resource, kwargs['id'], pt))
+            return {'items': [channel_item(ch_id) for ch_id in kwargs['id'].split(',')]}
+
+        if resource == 'playlistitems':
+            self.calls.append((resource, kwargs['playlistId'], pt))
+            responses = {'items': [playlist_item(kwargs['playlistId'][2:], page * 2 + i) for i in range(2)]}
+
+        elif resource == 'commentThreads':
+            self.calls.append((resource, kwargs['videoId'], pt))
+            responses = {'items': [thread_item(kwargs['videoId'], page * 2, 7),
+                                   thread_item(kwargs['videoId'], page * 2 + 1, 0)]}
+
+        elif resource == 'comments':
+            self.calls.append((resource, kwargs['parentId'], pt))
+            responses = {'items': [{'snippet': {'textDisplay': '%s-r%d' % (kwargs['parentId'], page * 3 + i)}}
+                                   for i in range(3 if page < 2 else 1)]}
+
+        else:
+            raise AssertionError(resource)
+
+        if page < 2:
+            responses['nextPageToken'] = str(page + 1)
+
+        return responses
+
+    def pages(self, resource):
+        return [call for call in self.calls if call[0] == resource]
+
+
+class FakeMySQL(object):
+    """MySQL stand-in, rows are kept once committed"""
+
+    def __init__(self):
+        self.rows = {}
+        self.pending = {}
+
+    def bulk_insert(self, table, columns, rows, update=None, ignore=False, commit=True):
+        self.pending.setdefault(table, []).extend(rows)
+
+        if commit:
+            self.commit()
+
+    def commit(self):
+        for table, rows in self.pending.items():
+            self.rows.setdefault(table, []).extend(rows)
+
+        self.pending = {}
+
+
+@unittest.skipIf(main_crawler is None, 'googleapiclient and pymysql are not installed')
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.journal = RunJournal(os.path.join(self.dir, 'journal.sqlite'), 'test')
+        self.watermarks = WatermarkStore(os.path.join(self.dir, 'watermarks.sqlite'))
+
+    def tearDown(self):
+        self.journal.close()
+        self.watermarks.close()
+        shutil.rmtree(self.dir)
+
+    def crawl_channels(self, api, resume=False):
+        """main_crawler run, returns the written video ids"""
+        self.journal.start(resume=resume)
+        conn = FakeMySQL()
+
+        with YoutubeCrawler(['key'], processes=4, quota_path=None) as yc:
+            yc._response = api
+            main_crawler.youtube_main_crawler(None, conn, yc, vid_update=False, journal=self.journal,
+                                              watermarks=self.watermarks, ch_ids=CHANNELS)
+
+        return [row[2] for row in conn.rows.get('YOUTUBE.t_ch_vid_desc', [])]
+
+    def crawl_comments(self, api, resume=False):
+        """comment_crawler loop, returns the written comment texts"""
+        self.journal.start(resume=resume)
+        vids = [vid for vid in VIDEOS if vid not in self.journal.completed()]
+        written = []
+
+        with YoutubeCrawler(['key'], processes=4, quota_path=None) as yc:
+            yc._response = api
+
+            try:
+                for page in yc.iter_comment(','.join(vids), page_tokens=self.journal):
+                    written.extend(c.vid_comment for c in page['comments'])
+
+                    if page['last']:
+                        self.journal.done([page['vid_id']])
+
+                    else:
+                        self.journal.set(page['vid_id'], page['state'])
+
+            except QuotaExhausted:
+                return written
+
+        self.journal.finish()
+        return written
+
+    def test_channels(self):
+        full = FakeYoutube()
+        expected = sorted(self.crawl_channels(full))
+
+        for quota_after in range(1, len(full.calls)):
+            with self.subTest(quota_after=quota_after):
+                self.tearDown()
+                self.setUp()
+                stopped, resumed = FakeYoutube(quota_after), FakeYoutube()
+
+                written = self.crawl_channels(stopped) + self.crawl_channels(resumed, resume=True)
+
+                # no playlist page is fetched twice, no video is lost
+                self.assertFalse(set(stopped.pages('playlistitems')) & set(resumed.pages('playlistitems')))
+                self.assertEqual(sorted(set(written)), expected)
+                self.assertEqual(self.journal.completed(), set())
+
+                # the newest video of every channel, even when it was written by the stopped run
+                for ch_id in CHANNELS:
+                    self.assertEqual(self.watermarks.get(ch_id)['vid_id'], '%s-v0' % ch_id)
+
+    def test_comments(self):
+        full = FakeYoutube()
+        expected = sorted(self.crawl_comments(full))
+
+        for quota_after in range(1, len(full.calls)):
+            with self.subTest(quota_after=quota_after):
+                self.tearDown()
+                self.setUp()
+                stopped, resumed = FakeYoutube(quota_after), FakeYoutube()
+
+                written = self.crawl_comments(stopped)
+
+                # unfinished reply threads are journaled with their next page
+                for vid in VIDEOS:
+                    state = self.journal.get(vid)
+
+                    if state is not None:
+                        self.assertIsInstance(state['replies'], dict)
+
+                written += self.crawl_comments(resumed, resume=True)
+
+                self.assertFalse(set(stopped.calls) & set(resumed.calls))
+                self.assertEqual(sorted(written), expected)
+
+    def test_legacy_reply_state(self):
+        # journals of older runs keep a list of unfinished reply threads, they are crawled from their first page
+        self.journal.start()
+        self.journal.set('v0', {'token': None, 'cursor': None, 'replies': ['v0-t0']})
+        api = FakeYoutube()
+
+        written = self.crawl_comments(api, resume=True)
+
+        self.assertEqual([call for call in api.pages('comments') if call[1] == 'v0-t0'],
+                         [('comments', 'v0-t0', ''), ('comments', 'v0-t0', '1'), ('comments', 'v0-t0', '2')])
+        self.assertFalse([call for call in api.pages('commentThreads') if call[1] == 'v0'])
+        self.assertEqual(len([text for text in written if text.startswith('v0-t0-r')]), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,48 +1,69 @@
+import logging
 import os
+from datetime import datetime
 
-from utils.mysql import MySQL
-from YoutubeData.YoutubeCrawler import YoutubeCrawler
+from utils.mysql import MySQLPool
+from YoutubeData.YoutubeCrawler import YoutubeCrawler, QuotaExhausted
+from YoutubeData.cache import ResponseCache
+from YoutubeData.categories import CategoryStore
+from YoutubeData.records import TrendRank, VideoTrend
+from YoutubeData.trend_delta import TrendSnapshotStore
+
+logger = logging.getLogger(__name__)
 
 api_list = [os.environ['API_1'], os.environ['API_2'], os.environ['API_3'],
             os.environ['API_4'], os.environ['API_5']]
+
+# comma joined region codes, e.g. TREND_REGIONS=KR,US,JP
+regions = os.environ.get('TREND_REGIONS', 'KR').split(',')
+
+# TREND_TOP=1 fetches the overall chart (category 0) only, one chart per region instead of one per category
+top = os.environ.get('TREND_TOP', '0') == '1'
             
-conn = MySQL(host=os.environ['host'], 
-             db=os.environ['db'], 
-             user=os.environ['user'], 
-             port=os.environ['port'], 
-             passwd=os.environ['pw'],
-             charset='utf8mb4',
-             auto_commit=False)
-             
-def th_url_join(video_list, thumb, t):
-    
-    for video in video_list:
-        th_list = []
-        for key in video[thumb].keys():
-            th_list.append(video[thumb][key]['url'])
-        video[thumb] = ', '.join(th_list)
-        
-        video[t] = video[t][:-1]
-        
-    return video_list
-    
+pool = MySQLPool(size=1,
+                 host=os.environ['host'], 
+                 db=os.environ['db'], 
+                 user=os.environ['user'], 
+                 port=os.environ['port'], 
+                 passwd=os.environ['pw'],
+                 charset='utf8mb4',
+                 auto_commit=False)
+
 def main():
     """
     First Crawler. Expected to run every 1 hour
+    every region's charts, one per video category unless TREND_TOP=1, are fetched concurrently
+    and compared with the previous run's charts.
+    t_vid_trend gets the full rows of videos new to a chart only,
+    t_vid_trend_rank gets chart entries, exits and rank changes
     """
-    yc = YoutubeCrawler(api_list, processes=50)
-    vmp_list = yc.video_trend(rc='KR', top=True)
-    vmp_list_pre = th_url_join(vmp_list, 'vid_th', 'vid_published_at')
-
-    insert_vid_trend = 'INSERT IGNORE INTO YOUTUBE.t_vid_trend \
-                       (vid_id, vid_published_at, ch_id, vid_title, vid_desc, vid_th, ch_title, \
-                       vid_tags, vid_cat_id, region_code, vid_cat, vid_rank, vid_trend_cat) \
-                       VALUES (%(vid_id)s, %(vid_published_at)s, %(ch_id)s, %(vid_title)s, \
-                       %(vid_desc)s, %(vid_th)s, %(ch_title)s, %(vid_tags)s, %(vid_cat_id)s, \
-                       %(region_code)s, %(vid_cat)s, %(vid_rank)s, %(vid_trend_cat)s) \
-                       '
-    conn.executemany(insert_vid_trend, vmp_list_pre)
-    conn.conn.commit()
+    snapshots = TrendSnapshotStore('.trend_snapshots.json')
+    collected_at = datetime.utcnow().replace(microsecond=0)
+
+    try:
+        with YoutubeCrawler(api_list, processes=50, cache=ResponseCache('.youtube_cache.sqlite'),
+                            categories=CategoryStore('.video_categories.json')) as yc:
+            vmp_list = yc.video_trend_regions(regions, top=top)
+
+    except QuotaExhausted as e:
+        # nothing is written, the next hourly run compares with the last written chart
+        logger.error('%s, trend charts are collected again on the next run' % e)
+        pool.close()
+        return
+
+    new_videos, changes = snapshots.diff(vmp_list, collected_at)
+
+    with pool.connection() as conn:
+        conn.bulk_insert('YOUTUBE.t_vid_trend', VideoTrend.COLUMNS, [v.to_row() for v in new_videos],
+                         ignore=True, commit=False)
+        conn.bulk_insert('YOUTUBE.t_vid_trend_rank', TrendRank.COLUMNS, [c.to_row() for c in changes],
+                         commit=False)
+        conn.commit()
+
+    # the next run compares with this chart only once it is written
+    snapshots.save()
+
+    pool.close()
     
 if __name__ == '__main__':
     
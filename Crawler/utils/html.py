@@ -0,0 +1,34 @@
+"""
+HTML parsing for the chart and keyword scrapers.
+lxml is used when installed, it builds the tree several times faster than html.parser
+"""
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+
+def parse_html(text, parse_only=None):
+    """
+    Args:
+        text(str): html document
+        parse_only(SoupStrainer): only the matching tags and their children are built, None for the whole page
+    Returns:
+        BeautifulSoup
+    """
+    return BeautifulSoup(text, PARSER, parse_only=parse_only)
+
+
+def has_class(tag, *names):
+    """
+    Args:
+        tag(bs4.Tag): tag
+        names(str): css classes
+    Returns:
+        bool: True if tag has every class in names
+    """
+    classes = tag.get('class') or ()
+    return all(name in classes for name in names)
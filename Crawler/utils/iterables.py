@@ -0,0 +1,24 @@
+"""
+Helpers for reading large iterables a bounded chunk at a time
+"""
+
+
+def chunks(iterable, n):
+    """
+    Args:
+        iterable(iterable): items, read lazily
+        n(int): chunk size
+    Yields:
+        list: n items, fewer in the last chunk
+    """
+    chunk = []
+
+    for item in iterable:
+        chunk.append(item)
+
+        if len(chunk) == n:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
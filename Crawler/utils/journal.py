@@ -0,0 +1,110 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class RunJournal(object):
+    """
+    Progress of one crawler run in a sqlite file: finished items and the page state of items in progress.
+    A run that stopped before finish() is continued by start(resume=True)
+
+    Examples:
+        >>> journal = RunJournal('.run_journal.sqlite', 'comment_crawler')
+        >>> journal.start(resume=True)
+        >>> todo = [vid for vid in vids if vid not in journal.completed()]
+        >>> journal.set(vid, {'token': next_page_token})   # after a page is written
+        >>> journal.done([vid])                             # after the last page is written
+        >>> journal.finish()
+    """
+
+    def __init__(self, path='.run_journal.sqlite', name='crawler'):
+        """
+        Args:
+            path(str): sqlite file path
+            name(str): crawler name, every crawler keeps its own run
+        """
+        self.path = path
+        self.name = name
+        self.lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS run '
+                               '(name TEXT PRIMARY KEY, started_at REAL, finished_at REAL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS entry '
+                               '(name TEXT, item TEXT, state TEXT, done INTEGER, PRIMARY KEY (name, item))')
+        return self._conn
+
+    def start(self, resume=False):
+        """
+        Args:
+            resume(bool): continue the last run if it did not finish, otherwise start a new one
+        Returns:
+            bool: True if an unfinished run is continued
+        """
+        with self.lock, self.conn:
+            row = self.conn.execute('SELECT finished_at FROM run WHERE name = ?', (self.name,)).fetchone()
+
+            if resume and row is not None and row[0] is None:
+                return True
+
+            self.conn.execute('DELETE FROM entry WHERE name = ?', (self.name,))
+            self.conn.execute('REPLACE INTO run (name, started_at, finished_at) VALUES (?, ?, NULL)',
+                              (self.name, time.time()))
+            return False
+
+    def completed(self):
+        """
+        Returns:
+            set: items marked done in this run
+        """
+        with self.lock:
+            return {row[0] for row in self.conn.execute('SELECT item FROM entry WHERE name = ? AND done = 1',
+                                                        (self.name,))}
+
+    def get(self, item):
+        """
+        Args:
+            item(str): item id
+        Returns:
+            dict: page state of an item in progress, None if not started or done
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT state FROM entry WHERE name = ? AND item = ? AND done = 0',
+                                    (self.name, item)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def set(self, item, state):
+        """
+        Args:
+            item(str): item id
+            state(dict): json serializable page state, e.g. {'token': next page token}
+        """
+        with self.lock, self.conn:
+            self.conn.execute('REPLACE INTO entry (name, item, state, done) VALUES (?, ?, ?, 0)',
+                              (self.name, item, json.dumps(state)))
+
+    def done(self, items):
+        """
+        Args:
+            items(iterable): item ids whose data is written
+        """
+        with self.lock, self.conn:
+            self.conn.executemany('REPLACE INTO entry (name, item, state, done) VALUES (?, ?, NULL, 1)',
+                                  [(self.name, item) for item in items])
+
+    def finish(self):
+        """mark the run finished and drop its entries"""
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM entry WHERE name = ?', (self.name,))
+            self.conn.execute('UPDATE run SET finished_at = ? WHERE name = ?', (time.time(), self.name))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
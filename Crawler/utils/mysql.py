@@ -1,10 +1,27 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
 import pymysql
 
+logger = logging.getLogger(__name__)
+
+# connection lost or refused, worth a reconnect. everything else fails fast
+RETRY_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError)
+
 
 class MySQL(object):
     """MySQL Helper Function"""
 
-    def __init__(self, host, user, passwd, db, port=3306, charset='UTF8', auto_commit=True, auto_connect=True):
+    def __init__(self, host, user, passwd, db, port=3306, charset='UTF8', auto_commit=True, auto_connect=True,
+                 retries=3, backoff=0.5):
+        """
+        Args:
+            retries(int): reconnect attempts on OperationalError / InterfaceError
+            backoff(float): seconds before the first reconnect, doubled on every attempt
+        """
         self.init_command = None
         self.host = host
         self.user = user
@@ -13,6 +30,10 @@ class MySQL(object):
         self.port = int(port)
         self.charset = charset.replace('-', '').upper()
         self.auto_commit = auto_commit
+        self.retries = retries
+        self.backoff = backoff
+        # uncommitted statements on the current connection, a reconnect would silently drop them
+        self.dirty = False
         self.conn = None
         self.cursor = None
         if auto_connect:
@@ -23,6 +44,7 @@ class MySQL(object):
         self.conn = pymysql.connect(host=self.host, user=self.user, passwd=self.passwd, db=self.db, port=self.port,
                                     charset=self.charset, init_command=self.init_command, autocommit=self.auto_commit)
         self.cursor = self.conn.cursor(pymysql.cursors.DictCursor)
+        self.dirty = False
 
     def __repr__(self):
         return '%s@%s:%s/%s' % (self.user, self.host, self.port, self.db)
@@ -31,6 +53,27 @@ class MySQL(object):
         if self.cursor:
             self.conn.close()
 
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+        self.cursor = None
+
+    def ping(self):
+        """health check, reconnect if the connection is gone"""
+        try:
+            self.conn.ping(reconnect=False)
+        except RETRY_ERRORS:
+            self._reconnect()
+
+    def commit(self):
+        self.conn.commit()
+        self.dirty = False
+
+    def rollback(self):
+        self.conn.rollback()
+        self.dirty = False
+
     def affected_rows(self):
         # when using 'insert .. on duplicate key update ..'
         # 0 if an existing row is set to its current values
@@ -46,36 +89,229 @@ class MySQL(object):
     def addslashes(field):
         return field.replace('\\', '\\\\').replace("'", "\\'").replace('"', '\\"')
 
+    def _reconnect(self, attempt=0):
+        time.sleep(self.backoff * 2 ** attempt)
+        self.connect()
+
+    def _retry(self, func, write=False):
+        """call func, reconnecting with backoff on OperationalError / InterfaceError only.
+        an open transaction is never retried on a new connection, its earlier statements would be lost
+        Args:
+            func(callable): runs one statement on the current connection
+            write(bool): True if func may change data, it then opens a transaction until commit or rollback.
+                         reads leave the connection free to reconnect
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                result = func()
+                if write and not self.auto_commit:
+                    self.dirty = True
+                return result
+
+            except RETRY_ERRORS as e:
+                if self.dirty or attempt == self.retries:
+                    raise
+
+                logger.warning('%r failed: %r, reconnect %d/%d' % (self, e, attempt + 1, self.retries))
+
+                try:
+                    self._reconnect(attempt)
+                except RETRY_ERRORS as e:
+                    logger.warning('%r reconnect failed: %r' % (self, e))
+
     def execute(self, query, *args, **kwargs):
-        try:
-            self.cursor.execute(query, *args, **kwargs)
-        except:  # pymysql.OperationalError:
-            self.connect()  # reconnect
-            self.cursor.execute(query, *args, **kwargs)
+        self._retry(lambda: self.cursor.execute(query, *args, **kwargs), write=True)
         return
 
     def executemany(self, query, *args, **kwargs):
-        try:
-            self.cursor.executemany(query, *args, **kwargs)
-        except:  # pymysql.OperationalError:
-            self.connect()  # reconnect
-            self.cursor.executemany(query, *args, **kwargs)
+        self._retry(lambda: self.cursor.executemany(query, *args, **kwargs), write=True)
         return
 
-    def select(self, query, *args, **kwargs):
+    def bulk_insert(self, table, columns, rows, update=None, ignore=False,
+                    max_rows=1000, max_bytes=1024 * 1024, commit=True):
+        """multi-row INSERT [IGNORE] ... ON DUPLICATE KEY UPDATE, split by row and byte limit
+        Args:
+            table(str): table name
+            columns(list): column names
+            rows(iterable): tuples in columns order or dicts keyed by column name
+            update(list): columns set to the new value on duplicate key, None for a plain insert
+            ignore(bool): INSERT IGNORE
+            max_rows(int): maximum rows per statement
+            max_bytes(int): maximum statement size, keep below max_allowed_packet
+            commit(bool): commit once after every statement is sent
+        Returns:
+            int: the number of rows sent
+        Examples:
+            >>> conn.bulk_insert('YOUTUBE.t_ch_cstats', ['ch_id', 'ch_n_sub'], [('UC...', 10)], update=['ch_n_sub'])
+            1
+        """
+        prefix = 'INSERT %sINTO %s (%s) VALUES ' % ('IGNORE ' if ignore else '', table, ', '.join(columns))
+        postfix = ''
+
+        if update:
+            postfix = ' ON DUPLICATE KEY UPDATE ' + ', '.join('%s=VALUES(%s)' % (c, c) for c in update)
+
+        row_format = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+        values = []
+        size = len(prefix) + len(postfix)
+        n_rows = 0
+
+        for row in rows:
+
+            if isinstance(row, dict):
+                row = [row[c] for c in columns]
+
+            value = self.cursor.mogrify(row_format, row)
+            value_size = len(value.encode('utf-8')) + 1
+
+            if values and (len(values) >= max_rows or size + value_size > max_bytes):
+                self.execute(prefix + ','.join(values) + postfix)
+                values = []
+                size = len(prefix) + len(postfix)
+
+            values.append(value)
+            size += value_size
+            n_rows += 1
+
+        if values:
+            self.execute(prefix + ','.join(values) + postfix)
+
+        if commit and not self.auto_commit:
+            self.commit()
+
+        return n_rows
+
+    def select(self, query, *args, stream=False, size=1000, rows='dict', **kwargs):
+        """
+        Args:
+            query(str): select query
+            stream(bool): True for an unbuffered server side cursor, memory stays flat for any result size.
+                          the connection cannot run other queries until the generator is exhausted or closed,
+                          and a consumer pausing longer than net_write_timeout loses the connection
+            size(int): rows fetched per round trip
+            rows(str): 'dict' yields dict rows, 'tuple' yields tuple rows,
+                       'columns' yields one {column: [values]} dict per fetched chunk
+        Yields:
+            dict or tuple
+        """
+        if rows not in ('dict', 'tuple', 'columns'):
+            raise ValueError("rows must be 'dict', 'tuple' or 'columns', got %r" % rows)
+
+        if rows == 'dict':
+            cursor_class = pymysql.cursors.SSDictCursor if stream else pymysql.cursors.DictCursor
+        else:
+            cursor_class = pymysql.cursors.SSCursor if stream else pymysql.cursors.Cursor
+
+        cursors = []
+
+        def execute():
+            # a reconnect replaces self.conn, so the cursor is made per attempt
+            cursor = self.conn.cursor(cursor_class)
+            cursors.append(cursor)
+            cursor.execute(query, *args, **kwargs)
+
+        # only retried before the first row, a generator that has yielded must not restart
+        self._retry(execute)
+        cursor = cursors[-1]
+
         try:
-            self.cursor.execute(query, *args, **kwargs)
-            while True:
-                row = self.cursor.fetchone()
-                if not row:
-                    break
-                yield row
-        except:  # pymysql.OperationalError:
-            self.connect()  # reconnect
-            self.cursor.execute(query, *args, **kwargs)
             while True:
-                row = self.cursor.fetchone()
-                if not row:
+                chunk = cursor.fetchmany(size)
+                if not chunk:
                     break
-                yield row
-        return
+
+                if rows == 'columns':
+                    names = [column[0] for column in cursor.description]
+                    yield dict(zip(names, (list(values) for values in zip(*chunk))))
+
+                else:
+                    for row in chunk:
+                        yield row
+        finally:
+            cursor.close()
+
+
+class MySQLPool(object):
+    """
+    Thread safe pool of MySQL connections, health checked on checkout
+
+    Examples:
+        >>> pool = MySQLPool(size=2, host=host, user=user, passwd=pw, db=db, charset='utf8mb4', auto_commit=False)
+        >>> with pool.connection() as conn:
+        ...     conn.execute(query)
+        ...     conn.commit()
+    """
+
+    def __init__(self, size=2, **kwargs):
+        """
+        Args:
+            size(int): maximum number of connections
+            **kwargs: MySQL arguments
+        """
+        self.size = size
+        self.kwargs = kwargs
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.created = 0
+
+    def _checkout(self):
+        try:
+            conn = self.idle.get_nowait()
+
+        except queue.Empty:
+            with self.lock:
+                create = self.created < self.size
+                if create:
+                    self.created += 1
+
+            if not create:
+                return self.idle.get()
+
+            try:
+                return MySQL(**self.kwargs)
+            except Exception:
+                with self.lock:
+                    self.created -= 1
+                raise
+
+        conn.ping()
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        Yields:
+            MySQL: connection, an uncommitted transaction is rolled back when it is returned
+        """
+        conn = self._checkout()
+        broken = False
+
+        try:
+            yield conn
+
+        except RETRY_ERRORS:
+            broken = True
+            raise
+
+        finally:
+            if not broken and conn.dirty:
+                try:
+                    conn.rollback()
+                except RETRY_ERRORS:
+                    broken = True
+
+            if broken:
+                # replaced by a new connection on a later checkout
+                conn.close()
+                with self.lock:
+                    self.created -= 1
+            else:
+                self.idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
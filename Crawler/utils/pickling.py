@@ -0,0 +1,25 @@
+"""
+Pickling of the lock guarded state stores sent to process pool workers
+"""
+import threading
+
+
+class LockPickling(object):
+    """
+    Mixin for a class guarding its state with self.lock.
+    A lock can not be pickled, the copy in a worker gets a new one
+
+    Examples:
+        >>> class CategoryStore(LockPickling):
+        ...     def __init__(self):
+        ...         self.lock = threading.Lock()
+    """
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
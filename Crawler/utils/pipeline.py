@@ -0,0 +1,116 @@
+import logging
+import queue
+import threading
+import types
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Pipeline(object):
+    """
+    Thread based staged pipeline with bounded queues between the stages.
+    Every stage runs in its own thread, so item N+1 is processed by a stage while item N is in the next one.
+    A stage returning a generator feeds every yielded item to the next stage as soon as it is yielded,
+    so one input can stream many items without holding them all.
+
+    When a stage raises, the stages before it stop, the stages after it drain what is already queued,
+    and run() re-raises the exception.
+
+    Examples:
+        >>> Pipeline(id_batches(), [fetch, write], maxsize=2).run()
+    """
+
+    def __init__(self, source, stages, maxsize=2):
+        """
+        Args:
+            source(iterable): items fed to the first stage
+            stages(list): callables taking one item, the return value or every yielded item is fed to the next stage
+            maxsize(int): queue size between two stages
+        """
+        self.source = source
+        self.stages = list(stages)
+        self.queues = [queue.Queue(maxsize=maxsize) for _ in self.stages]
+        # cancel[i] is set once stage i or a stage after it has failed
+        self.cancel = [threading.Event() for _ in self.stages]
+        self.errors = []
+
+    def _put(self, i, item):
+        """put into queue i, False if stage i or a later stage has failed.
+        every stage drains its queue until _DONE, so a blocking put always returns
+        """
+        if self.cancel[i].is_set():
+            return False
+
+        self.queues[i].put(item)
+        return True
+
+    def _fail(self, i, e):
+        logger.error('pipeline stage %d failed: %r' % (i, e))
+        self.errors.append(e)
+
+        for j in range(i + 1):
+            self.cancel[j].set()
+
+    def _run_source(self):
+        try:
+            for item in self.source:
+                if not self._put(0, item):
+                    break
+        except Exception as e:
+            logger.error('pipeline source failed: %r' % e)
+            self.errors.append(e)
+        finally:
+            self.queues[0].put(_DONE)
+
+    def _run_stage(self, i):
+        stage = self.stages[i]
+        last = i == len(self.stages) - 1
+        failed = False
+
+        while True:
+            item = self.queues[i].get()
+
+            if item is _DONE:
+                break
+
+            if failed:
+                continue
+
+            try:
+                result = stage(item)
+                results = result if isinstance(result, types.GeneratorType) else (result,)
+
+                for result_item in results:
+                    if not last and not self._put(i + 1, result_item):
+                        failed = True
+                        break
+
+                if failed and isinstance(results, types.GeneratorType):
+                    results.close()
+
+            except Exception as e:
+                self._fail(i, e)
+                failed = True
+
+        if not last:
+            self.queues[i + 1].put(_DONE)
+
+    def run(self):
+        """
+        Raises:
+            Exception: the first exception raised by the source or a stage
+        """
+        threads = [threading.Thread(target=self._run_source, daemon=True)]
+        threads.extend(threading.Thread(target=self._run_stage, args=(i,), daemon=True)
+                       for i in range(len(self.stages)))
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        if self.errors:
+            raise self.errors[0]
@@ -0,0 +1,26 @@
+"""
+Base of the slotted namedtuple records written with MySQL.bulk_insert
+"""
+
+
+class Record(object):
+    """
+    Mixin for a namedtuple whose fields start with the columns of its table
+
+    Examples:
+        >>> class ChartRank(Record, namedtuple('ChartRank', ['provider', 'song', ...])):
+        ...     __slots__ = ()
+        ...     COLUMNS = ('provider', 'song', ...)
+        >>> conn.bulk_insert('t_music_chart_rank', ChartRank.COLUMNS, [r.to_row() for r in records])
+    """
+    __slots__ = ()
+
+    # table columns, a prefix of the fields
+    COLUMNS = ()
+
+    def to_row(self):
+        """
+        Returns:
+            tuple: values in COLUMNS order
+        """
+        return tuple(self[:len(self.COLUMNS)])
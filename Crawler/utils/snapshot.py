@@ -0,0 +1,92 @@
+import threading
+
+from utils.store import JsonStore
+
+
+class SnapshotStore(object):
+    """
+    Previous ranking per key, {item: rank}, kept in memory and in a json file.
+    compare() diffs new rankings with it, save() advances the rankings once the diff is written.
+    Items are strings or tuples of strings, e.g. (song, artist)
+
+    Examples:
+        >>> store = SnapshotStore('.keyword_snapshots.json')
+        >>> changes = store.compare({'naver:all': {'keyword': 1, ...}})
+        >>> # write changes, then
+        >>> store.save()
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path(str): json file path
+        """
+        self.store = JsonStore(path)
+        self.snapshots = {key: self._load_ranking(ranking) for key, ranking in self.store.load(default={}).items()}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    @staticmethod
+    def _load_ranking(ranking):
+        # {item: rank} of string items, or [[item, rank], ...] where a list item is a tuple
+        if isinstance(ranking, dict):
+            return ranking
+
+        return {tuple(item) if isinstance(item, list) else item: rank for item, rank in ranking}
+
+    def items(self):
+        """
+        Returns:
+            set: items of every saved ranking
+        """
+        return {item for ranking in self.snapshots.values() for item in ranking}
+
+    def compare(self, rankings):
+        """compare every ranking with its snapshot.
+        keys missing from rankings are left as they are, a failed fetch is not every item leaving a ranking
+        Args:
+            rankings(dict): key => {item: rank} of one snapshot
+        Returns:
+            list: (key, item, rank, prev_rank) of entries (prev_rank None), exits (rank None) and rank changes
+        """
+        changes = []
+        pending = {}
+
+        for key, current in rankings.items():
+
+            previous = self.snapshots.get(key, {})
+
+            if current == previous:
+                continue
+
+            for item, rank in current.items():
+                prev_rank = previous.get(item)
+
+                if prev_rank != rank:
+                    changes.append((key, item, rank, prev_rank))
+
+            for item, prev_rank in previous.items():
+                if item not in current:
+                    changes.append((key, item, None, prev_rank))
+
+            pending[key] = current
+
+        with self.lock:
+            self.pending.update(pending)
+
+        return changes
+
+    def save(self):
+        """make the rankings of every compare() the new snapshots and persist them"""
+        with self.lock:
+            if not self.pending:
+                return
+
+            self.snapshots.update(self.pending)
+            self.pending = {}
+            self.store.save({key: sorted(([list(item) if isinstance(item, tuple) else item, rank]
+                                          for item, rank in ranking.items()), key=lambda x: x[1])
+                             for key, ranking in self.snapshots.items()})
@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+
+
+class JsonStore(object):
+    """Small JSON file store for crawler state (quota usage, checkpoints, ...)"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path(str): json file path
+        """
+        self.path = path
+
+    def load(self, default=None):
+        """
+        Args:
+            default: value returned when the file does not exist or is broken
+        Returns:
+            stored object
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+
+        except (IOError, ValueError):
+            return default
+
+    def save(self, data):
+        """write data atomically (temp file + rename) so a killed run never leaves half a file
+        Args:
+            data: json serializable object
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,90 @@
+"""
+Request headers for the chart and keyword scrapers, rotating over a bundled list of desktop browser user agents.
+Nothing is loaded from disk or the network, unlike fake_useragent.UserAgent()
+"""
+import itertools
+import threading
+
+# desktop browsers, the scraped pages serve the same markup to all of them
+USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; WOW64; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+    'Version/17.2 Safari/605.1.15',
+)
+
+
+class HeaderProvider(object):
+    """
+    Hands out request headers round robin over user_agents, safe to share between threads
+
+    Examples:
+        >>> provider = HeaderProvider()
+        >>> provider.headers()
+        {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64; Trident/7.0; rv:11.0) like Gecko'}
+    """
+
+    def __init__(self, user_agents=USER_AGENTS, extra=None):
+        """
+        Args:
+            user_agents(tuple): user agent strings to rotate over
+            extra(dict): headers sent with every user agent
+        """
+        if not user_agents:
+            raise ValueError('user_agents is empty')
+
+        self.user_agents = tuple(user_agents)
+        self.extra = dict(extra or {})
+        self._cycle = itertools.cycle(self.user_agents)
+        self.lock = threading.Lock()
+
+    def user_agent(self):
+        """
+        Returns:
+            str: next user agent
+        """
+        with self.lock:
+            return next(self._cycle)
+
+    def headers(self):
+        """
+        Returns:
+            dict: extra headers and the next user agent
+        """
+        headers = dict(self.extra)
+        headers['User-Agent'] = self.user_agent()
+        return headers
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def default_provider():
+    """
+    Returns:
+        HeaderProvider: process wide provider, built on first use
+    """
+    global _provider
+
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = HeaderProvider()
+
+    return _provider
+
+
+def headers():
+    """
+    Returns:
+        dict: next headers of the process wide provider
+    """
+    return default_provider().headers()